@@ -1,3 +1,4 @@
+import asyncio
 import streamlit as st
 import interview
 import analyst
@@ -17,13 +18,18 @@ thread = {"configurable": {"thread_id": "1"}}
 
 graph = research_graph_builder()
 
+def stream(graph_input, stream_mode):
+    """ Collect the events of one graph run; the graph's nodes are async """
+    async def collect():
+        return [event async for event in graph.astream(graph_input, thread, stream_mode=stream_mode)]
+    return asyncio.run(collect())
+
 # Streamlit app title
 
 # Run the graph until the first interruption
-for event in graph.stream({"topic": topic,
-                        "max_analysts": max_analysts},
-                        thread,
-                        stream_mode="values"):
+for event in stream({"topic": topic,
+                     "max_analysts": max_analysts},
+                     stream_mode="values"):
 
     analysts = event.get('analysts', '')
     if analysts:
@@ -44,7 +50,7 @@ if st.button("Submit Feedback"):
     st.success("Feedback submitted successfully!")
 
     # Check
-    for event in graph.stream(None, thread, stream_mode="values"):
+    for event in stream(None, stream_mode="values"):
         analysts = event.get('analysts', '')
         if analysts:
             for analyst in analysts:
@@ -61,7 +67,7 @@ if st.button("Submit Feedback"):
 
     # Continue updates
     with st.spinner("researching and generating report..."):
-        for event in graph.stream(None, thread, stream_mode="updates"):
+        for event in stream(None, stream_mode="updates"):
             st.write("--Node--")
             node_name = next(iter(event.keys()))
             st.write(node_name)
@@ -8,6 +8,9 @@ from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_groq import ChatGroq
 import os
 from dotenv import load_dotenv
+from agents.limits import groq_limit
+from agents.tokens import merge_usage, node_usage
+from typing import Annotated
 
 
 load_dotenv()
@@ -37,6 +40,7 @@ class GenerateAnalystsState(TypedDict):
     max_analysts: int  # Number of analysts
     human_analyst_feedback: str  # Human feedback
     analysts: List[Analyst]  # Analyst asking questions
+    token_usage: Annotated[dict, merge_usage]  # Tokens sent and received per node
 
 # Define instructions for the analyst
 analyst_instructions = """You are tasked with creating a set of AI analyst personas. Follow these instructions carefully:
@@ -55,7 +59,7 @@ analyst_instructions = """You are tasked with creating a set of AI analyst perso
 5. Assign one analyst to each theme."""
 
 # Define the function to create analysts
-def create_analysts(state: GenerateAnalystsState):
+async def create_analysts(state: GenerateAnalystsState):
     topic = state['topic']
     max_analysts = state['max_analysts']
     human_analyst_feedback = state.get('human_analyst_feedback', '')
@@ -71,10 +75,12 @@ def create_analysts(state: GenerateAnalystsState):
     )
 
     # Generate analysts
-    analysts = structured_llm.invoke([SystemMessage(content=system_message)] + 
-                                      [HumanMessage(content="Generate the set of analysts.")])
+    prompt = [SystemMessage(content=system_message)] + [HumanMessage(content="Generate the set of analysts.")]
+    async with groq_limit:
+        analysts = await structured_llm.ainvoke(prompt)
 
-    return {"analysts": analysts.analysts}
+    return {"analysts": analysts.analysts,
+            "token_usage": node_usage("create_analysts", prompt, analysts.model_dump_json())}
 
 # Define a no-op human feedback function
 def human_feedback(state: GenerateAnalystsState):
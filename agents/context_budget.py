@@ -0,0 +1,174 @@
+import os
+import re
+import asyncio
+import hashlib
+from typing import List, Optional, Tuple
+from langchain_core.messages import HumanMessage, SystemMessage
+from agents.limits import groq_limit
+from agents.tokens import count_tokens, get_encoding, merge_usage, node_usage
+from api.services.cache import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Token budgets for the source documents placed in each prompt (mixtral-8x7b-32768 has a 32k window)
+ANSWER_CONTEXT_BUDGET = int(os.getenv("ANSWER_CONTEXT_BUDGET", 6000))
+SECTION_CONTEXT_BUDGET = int(os.getenv("SECTION_CONTEXT_BUDGET", 8000))
+REPORT_CONTEXT_BUDGET = int(os.getenv("REPORT_CONTEXT_BUDGET", 16000))
+# Below this share per document, truncation loses too much and documents are summarized instead
+MIN_DOCUMENT_TOKENS = int(os.getenv("MIN_DOCUMENT_TOKENS", 150))
+SUMMARY_GROUP_SIZE = 4
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", 1024))
+SUMMARY_CACHE_TTL_SECONDS = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", 6 * 60 * 60))
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+WORD_PATTERN = re.compile(r"\w+")
+DOCUMENT_HEADER_PATTERN = re.compile(r"^(<Document [^>]*>)\n(.*?)(\n</Document>)?$", re.DOTALL)
+
+summary_instructions = """You are condensing source documents for a researcher.
+
+Summarize the documents below in at most {max_words} words, keeping the facts, figures and names most relevant to: {query}
+
+Keep each document's <Document ...> tag line at the start of its summary so it can still be cited.
+
+Documents:
+
+{documents}"""
+
+# Group summaries keyed by their documents and focus. Interview context only grows by
+# appending, so earlier groups are unchanged from turn to turn and summarized once.
+summary_cache = TTLCache(maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL_SECONDS)
+
+def summary_key(docs: List[str], focus: str) -> str:
+    digest = hashlib.sha1(focus.encode("utf-8"))
+    for doc in docs:
+        digest.update(b"\0" + doc.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def dedupe(docs: List[str]) -> List[str]:
+    """ Drop documents whose text repeats an earlier one (ignoring whitespace and case) """
+    seen = set()
+    unique = []
+    for doc in docs:
+        key = hashlib.sha1(" ".join(doc.split()).lower().encode("utf-8")).hexdigest()
+        if key not in seen:
+            seen.add(key)
+            unique.append(doc)
+    return unique
+
+def truncate_extractive(doc: str, max_tokens: int, query: str = "") -> str:
+    """
+    Keep the sentences that share the most words with the query, in their
+    original order, within `max_tokens`. The <Document> tags are preserved.
+    """
+    if count_tokens(doc) <= max_tokens:
+        return doc
+    match = DOCUMENT_HEADER_PATTERN.match(doc)
+    header, body, footer = (match.group(1) + "\n", match.group(2), match.group(3) or "") if match else ("", doc, "")
+    budget = max_tokens - count_tokens(header + footer)
+
+    sentences = SENTENCE_PATTERN.split(body)
+    query_words = set(WORD_PATTERN.findall(query.lower()))
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(query_words & set(WORD_PATTERN.findall(sentences[i].lower()))), i)
+    )
+
+    kept, used = set(), 0
+    for i in ranked:
+        tokens = count_tokens(sentences[i]) + 1
+        if used + tokens <= budget:
+            kept.add(i)
+            used += tokens
+    if not kept:
+        # A single sentence is over budget: cut it at the token limit
+        encoding = get_encoding()
+        return header + encoding.decode(encoding.encode(body, disallowed_special=())[:max(budget, 0)]) + footer
+    return header + " ".join(sentences[i] for i in sorted(kept)) + footer
+
+def allocate(sizes: List[int], budget: int) -> List[int]:
+    """
+    Split a token budget across documents: small documents keep their full
+    size and the rest share what remains equally.
+    """
+    shares = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        shares[i] = min(sizes[i], share)
+        remaining -= shares[i]
+    return shares
+
+
+class ContextBudget:
+    """
+    Fits a list of source documents into a token budget: duplicates are
+    dropped, then documents are truncated to their most query-relevant
+    sentences, and when even that leaves too little of each document,
+    groups of documents are summarized by the LLM (map) and the summaries
+    fitted again (reduce). Group summaries are cached, so a growing context
+    only pays for the groups that are new.
+    """
+
+    def __init__(self, budget: int, llm=None, min_document_tokens: int = MIN_DOCUMENT_TOKENS):
+        self.budget = budget
+        self.llm = llm
+        self.min_document_tokens = min_document_tokens
+
+    async def summarize(self, docs: List[str], max_tokens: int, focus: str) -> Tuple[str, dict]:
+        """
+        Summarize a group of documents; returns the summary and the token usage of the call.
+        """
+        key = summary_key(docs, focus)
+        summary = summary_cache.get(key)
+        if summary is not None:
+            return summary, {}
+
+        prompt = summary_instructions.format(
+            max_words=max(50, int(max_tokens * 0.75)), query=focus or "the research topic", documents="\n\n".join(docs)
+        )
+        messages = [SystemMessage(content=prompt), HumanMessage(content="Summarize the documents.")]
+        async with groq_limit:
+            summary = await self.llm.ainvoke(messages)
+        summary_cache.set(key, summary.content)
+        return summary.content, node_usage("summarize_context", messages, summary.content)
+
+    async def fit(self, docs: List[str], query: str = "", depth: int = 0,
+                  focus: Optional[str] = None) -> Tuple[List[str], dict, dict]:
+        """
+        Returns the fitted documents, budget stats, and the token usage of any
+        summarization calls (keyed `summarize_context`), for the caller to
+        merge into its own `token_usage`. Truncation favours `query`; summaries
+        are written for `focus` (default: the query), which callers keep stable
+        across turns so cached summaries are reused.
+        """
+        focus = focus if focus is not None else query
+        docs = dedupe(docs)
+        sizes = [count_tokens(doc) for doc in docs]
+        stats = {"documents": len(docs), "input_tokens": sum(sizes), "strategy": "none"}
+        usage = {}
+
+        if sum(sizes) > self.budget:
+            shares = allocate(sizes, self.budget)
+            starved = any(share < min(self.min_document_tokens, size) for share, size in zip(shares, sizes))
+            if self.llm is not None and depth < 2 and starved:
+                # Map: summarize groups of documents in parallel; reduce: fit the summaries
+                groups = [docs[i:i + SUMMARY_GROUP_SIZE] for i in range(0, len(docs), SUMMARY_GROUP_SIZE)]
+                per_group = self.budget // len(groups)
+                results = await asyncio.gather(*(self.summarize(group, per_group, focus) for group in groups))
+                for _, call_usage in results:
+                    usage = merge_usage(usage, call_usage)
+                docs, _, reduce_usage = await self.fit([summary for summary, _ in results], query, depth + 1, focus)
+                usage = merge_usage(usage, reduce_usage)
+                stats["strategy"] = "map_reduce"
+            else:
+                docs = [truncate_extractive(doc, share, query) for doc, share in zip(docs, shares)]
+                stats["strategy"] = "extractive"
+
+        stats["output_tokens"] = sum(count_tokens(doc) for doc in docs)
+        return docs, stats, usage
+
+def format_documents(docs: List[str]) -> str:
+    return "\n\n---\n\n".join(docs)
@@ -5,15 +5,22 @@ from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
 from IPython.display import Image, display, FileLink
 from langgraph.graph import START, END, StateGraph
-from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_groq import ChatGroq
-import operator
 from typing import  Annotated
 from langgraph.graph import MessagesState
 from agents.analyst import Analyst
+from agents.limits import groq_limit, tavily_limit
+from agents.search_cache import search_cache
+from agents.context_budget import ContextBudget, format_documents, ANSWER_CONTEXT_BUDGET, SECTION_CONTEXT_BUDGET
+from agents.tokens import merge_usage, node_usage
+from api.models.hybrid_retriever import coverage_weights, query_coverage
+from api.services.chain_registry import chain_registry
+from api.services.executors import llm_executor
 from langchain_community.tools.tavily_search import TavilySearchResults
 import os
+import re
+import logging
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -25,9 +32,33 @@ llm=ChatGroq(temperature=0.2, model_name="mixtral-8x7b-32768", api_key=GROQ_API_
 
 tavily_search = TavilySearchResults(max_results=2)
 
+# Skip the web search once a turn's local documents cover this share of the (IDF-weighted) query terms
+LOCAL_RECALL_SKIP_WEB = float(os.getenv("LOCAL_RECALL_SKIP_WEB", 0.8))
+
+DOCUMENT_KEY_PATTERN = re.compile(r'<Document (href="[^"]*"|source="[^"]*" page="[^"]*")')
+
+def context_key(doc: str) -> str:
+    """ A document's URL (or source and page); the text itself when it has neither """
+    match = DOCUMENT_KEY_PATTERN.match(doc)
+    return match.group(1) if match else doc
+
+def merge_context(existing: list, new: list) -> list:
+    """ Append source docs, skipping any whose URL or source is already in the context """
+    seen = {context_key(doc) for doc in existing}
+    merged = list(existing)
+    for doc in new:
+        key = context_key(doc)
+        if key not in seen:
+            seen.add(key)
+            merged.append(doc)
+    return merged
+
 class InterviewState(MessagesState):
     max_num_turns: int # Number turns of conversation
-    context: Annotated[list, operator.add] # Source docs
+    context: Annotated[list, merge_context] # Source docs, one per item, unique by URL
+    search_query: str # Retrieval query for the current question
+    local_recall: float # How well this turn's local search covered its query
+    token_usage: Annotated[dict, merge_usage] # Tokens sent and received per node
     analyst: Analyst # Analyst asking questions
     interview: str # Interview transcript
     sections: list # Final key we duplicate in outer state for Send() API
@@ -53,7 +84,7 @@ When you are satisfied with your understanding, complete the interview with: "Th
 
 Remember to stay in character throughout your response, reflecting the persona and goals provided to you."""
 
-def generate_question(state: InterviewState):
+async def generate_question(state: InterviewState):
     """ Node to generate a question """
 
     # Get state
@@ -62,10 +93,12 @@ def generate_question(state: InterviewState):
 
     # Generate question
     system_message = question_instructions.format(goals=analyst.persona)
-    question = llm.invoke([SystemMessage(content=system_message)]+messages)
+    prompt = [SystemMessage(content=system_message)]+messages
+    async with groq_limit:
+        question = await llm.ainvoke(prompt)
 
     # Write messages to state
-    return {"messages": [question]}
+    return {"messages": [question], "token_usage": node_usage("ask_question", prompt, question.content)}
 
 # Search query writing
 search_instructions = SystemMessage(content=f"""You will be given a conversation between an analyst and an expert.
@@ -78,26 +111,60 @@ Pay particular attention to the final question posed by the analyst.
 
 Convert this final question into a well-structured web search query""")
 
-def search_web(state: InterviewState):
-    """ Retrieve docs from web search """
-    # Search query
+async def plan_search(state: InterviewState):
+    """ Turn the analyst's last question into one query shared by the web and local searches """
     structured_llm = llm.with_structured_output(SearchQuery)
-    search_query = structured_llm.invoke([search_instructions] + state['messages'])
-
-    # Search
-    search_docs = tavily_search.invoke(search_query.search_query)
-
-    # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
-            for doc in search_docs
-        ]
-    )
-    return {"context": [formatted_search_docs]}
+    prompt = [search_instructions] + state['messages']
+    async with groq_limit:
+        search_query = await structured_llm.ainvoke(prompt)
+    return {"search_query": search_query.search_query,
+            "token_usage": node_usage("plan_search", prompt, search_query.search_query)}
 
-def vector_search(state: InterviewState):
-   pass
+async def search_web(state: InterviewState):
+    """ Retrieve docs from web search """
+    query = state["search_query"]
+
+    # Runs after this turn's local search, so the skip is decided on this question's own coverage
+    if state.get("local_recall", 0.0) >= LOCAL_RECALL_SKIP_WEB:
+        return {}
+
+    # Search, reusing recent results for the same (normalized) query
+    search_docs = await search_cache.aget(query)
+    if search_docs is None:
+        async with tavily_limit:
+            search_docs = await tavily_search.ainvoke(query)
+        # Tavily reports errors as a string rather than raising
+        if isinstance(search_docs, list):
+            await search_cache.aset(query, search_docs)
+        else:
+            search_docs = []
+
+    # Format each document separately so the context reducer can drop repeats
+    return {"context": [
+        f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
+        for doc in search_docs
+    ]}
+
+async def vector_search(state: InterviewState):
+    """ Retrieve docs from our own indexed documents, through the chatbot's retriever """
+    query = state["search_query"]
+    try:
+        embedding = await chain_registry.embeddings.aembed_query(query)
+        docs = await llm_executor.run(chain_registry.retrieve, query, embedding)
+    except Exception as e:
+        # The interview can still go ahead on web results alone
+        logging.error(f"Local document search failed: {e}")
+        return {"local_recall": 0.0}
+
+    weights = coverage_weights(query, chain_registry.lexical_index)
+    local_recall = max((query_coverage(doc.page_content, weights) for doc in docs), default=0.0)
+    return {
+        "context": [
+            f'<Document source="{doc.metadata.get("source")}" page="{doc.metadata.get("page")}"/>\n{doc.page_content}\n</Document>'
+            for doc in docs
+        ],
+        "local_recall": local_recall,
+    }
 
 answer_instructions = """You are an expert being interviewed by an analyst.
 
@@ -127,22 +194,34 @@ When answering questions, follow these guidelines:
 
 And skip the addition of the brackets as well as the Document source preamble in your citation."""
 
-def generate_answer(state: InterviewState):
+async def generate_answer(state: InterviewState):
     """ Node to answer a question """
     # Get state
     analyst = state["analyst"]
     messages = state["messages"]
     context = state["context"]
 
+    # Fit the sources gathered so far into the answer's budget, favouring the latest question
+    # Summaries focus on the analyst rather than the question, so later turns reuse them
+    context, budget_stats, budget_usage = await ContextBudget(ANSWER_CONTEXT_BUDGET, llm).fit(
+        context, query=messages[-1].content, focus=analyst.description
+    )
+
     # Answer question
-    system_message = answer_instructions.format(goals=analyst.persona, context=context)
-    answer = llm.invoke([SystemMessage(content=system_message)] + messages)
+    system_message = answer_instructions.format(goals=analyst.persona, context=format_documents(context))
+    prompt = [SystemMessage(content=system_message)] + messages
+    async with groq_limit:
+        answer = await llm.ainvoke(prompt)
 
     # Name the message as coming from the expert
     answer.name = "expert"
 
+    usage = node_usage("answer_question", prompt, answer.content)
+    usage["answer_question"]["context_tokens_trimmed"] = budget_stats["input_tokens"] - budget_stats["output_tokens"]
+    usage = merge_usage(usage, budget_usage)
+
     # Append it to state
-    return {"messages": [answer]}
+    return {"messages": [answer], "token_usage": usage}
 
 def save_interview(state: InterviewState):
     """ Save interviews """
@@ -217,24 +296,34 @@ e. Sources (### header)
 - Include no preamble before the title of the report
 - Check that all guidelines have been followed"""
 
-def write_section(state: InterviewState):
+async def write_section(state: InterviewState):
     """ Node to answer a question """
     # Get state
     interview = state["interview"]
     context = state["context"]
     analyst = state["analyst"]
 
+    # Fit the source docs into the section's budget, favouring the analyst's focus
+    context, budget_stats, budget_usage = await ContextBudget(SECTION_CONTEXT_BUDGET, llm).fit(context, query=analyst.description)
+
     # Write section using either the gathered source docs from interview (context) or the interview itself (interview)
     system_message = section_writer_instructions.format(focus=analyst.description)
-    section = llm.invoke([SystemMessage(content=system_message)] + [HumanMessage(content=f"Use this source to write your section: {context}")])
+    prompt = [SystemMessage(content=system_message)] + [HumanMessage(content=f"Use this source to write your section: {format_documents(context)}")]
+    async with groq_limit:
+        section = await llm.ainvoke(prompt)
+
+    usage = node_usage("write_section", prompt, section.content)
+    usage["write_section"]["context_tokens_trimmed"] = budget_stats["input_tokens"] - budget_stats["output_tokens"]
+    usage = merge_usage(usage, budget_usage)
 
     # Append it to state
-    return {"sections": [section.content]}
+    return {"sections": [section.content], "token_usage": usage}
 
 def interview_graph_builder():
     # Add nodes and edges
     interview_builder = StateGraph(InterviewState)
     interview_builder.add_node("ask_question", generate_question)
+    interview_builder.add_node("plan_search", plan_search)
     interview_builder.add_node("search_web", search_web)
     interview_builder.add_node("vector_search", vector_search)
     interview_builder.add_node("answer_question", generate_answer)
@@ -243,14 +332,15 @@ def interview_graph_builder():
 
     # Flow
     interview_builder.add_edge(START, "ask_question")
-    interview_builder.add_edge("ask_question", "search_web")
-    interview_builder.add_edge("ask_question", "vector_search")
+    interview_builder.add_edge("ask_question", "plan_search")
+    # Local search first: it is quick, and decides whether the web search is needed at all
+    interview_builder.add_edge("plan_search", "vector_search")
+    interview_builder.add_edge("vector_search", "search_web")
     interview_builder.add_edge("search_web", "answer_question")
-    interview_builder.add_edge("vector_search", "answer_question")
     interview_builder.add_conditional_edges("answer_question", route_messages, ['ask_question', 'save_interview'])
     interview_builder.add_edge("save_interview", "write_section")
     interview_builder.add_edge("write_section", END)
-    memory = MemorySaver()
-    interview_graph = interview_builder.compile(checkpointer=memory).with_config(run_name="Conduct Interviews")
+
+    # Compiled by the caller, once, as a subgraph of the research graph
     return interview_builder
 
@@ -0,0 +1,44 @@
+import os
+import asyncio
+import weakref
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Concurrent requests allowed per external provider, shared by every graph run in the process
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", 4))
+TAVILY_MAX_CONCURRENCY = int(os.getenv("TAVILY_MAX_CONCURRENCY", 4))
+# Parallel graph tasks (e.g. interviews fanned out with Send) per run
+GRAPH_MAX_CONCURRENCY = int(os.getenv("GRAPH_MAX_CONCURRENCY", 8))
+
+
+class ProviderLimit:
+    """
+    An async context manager bounding concurrent calls to one provider.
+    Keeps one semaphore per event loop, since asyncio primitives cannot be
+    shared across loops (Streamlit starts a new loop per run).
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+
+groq_limit = ProviderLimit("groq", GROQ_MAX_CONCURRENCY)
+tavily_limit = ProviderLimit("tavily", TAVILY_MAX_CONCURRENCY)
@@ -18,8 +18,13 @@ from langgraph.graph import MessagesState
 from agents.analyst import Analyst
 from agents.analyst import create_analysts, human_feedback 
 from agents.interview import interview_graph_builder
+from agents.limits import groq_limit
+from agents.tokens import count_tokens, count_message_tokens, merge_usage, node_usage
+from agents.context_budget import ContextBudget, REPORT_CONTEXT_BUDGET
 from langchain_community.tools.tavily_search import TavilySearchResults
 import os
+import asyncio
+import logging
 import agents.interview
 from dotenv import load_dotenv
 
@@ -40,6 +45,8 @@ class ResearchGraphState(TypedDict):
     content: str # Content for the final report
     conclusion: str # Conclusion for the final report
     final_report: str # Final report
+    synthesis_tokens: dict # Token counts of the synthesis call
+    token_usage: Annotated[dict, merge_usage] # Tokens sent and received per node, including interviews
 
 from langgraph.constants import Send
 
@@ -61,6 +68,11 @@ def initiate_all_interviews(state: ResearchGraphState):
                                            )
                                                        ]}) for analyst in state["analysts"]]
 
+class ReportSynthesis(BaseModel):
+    introduction: str = Field(description="Introduction: a # title followed by a ## Introduction section of about 100 words.")
+    content: str = Field(description="Report body, starting with ## Insights and ending with a ## Sources section.")
+    conclusion: str = Field(description="A ## Conclusion section of about 100 words.")
+
 report_writer_instructions = """You are a research writer creating a report on this overall topic:
 
 {topic}
@@ -70,90 +82,93 @@ You have a team of analysts. Each analyst has done two things:
 1. They conducted an interview with an expert on a specific sub-topic.
 2. They write up their finding into a memo.
 
-Your task:
+Your task is to write three parts of the report from these memos.
+
+The body (content):
 
-1. You will be given a collection of memos from your analysts.
-2. Think carefully about the insights from each memo.
-3. Consolidate these into a crisp overall summary that ties together the central ideas from all of the memos.
-4. Summarize the central points in each memo into a cohesive single narrative.
+1. Think carefully about the insights from each memo.
+2. Consolidate these into a crisp overall summary that ties together the central ideas from all of the memos.
+3. Summarize the central points in each memo into a cohesive single narrative.
+4. Use markdown formatting, no pre-amble and no sub-headings.
+5. Start the body with a single title header: ## Insights
+6. Do not mention any analyst names.
+7. Preserve any citations in the memos, which will be annotated in brackets, for example [1] or [2].
+8. Create a final, consolidated list of sources and add to a Sources section with the `## Sources` header.
+9. List your sources in order and do not repeat.
 
-To format your report:
+The introduction and conclusion:
 
-1. Use markdown formatting.
-2. Include no pre-amble for the report.
-3. Use no sub-heading.
-4. Start your report with a single title header: ## Insights
-5. Do not mention any analyst names in your report.
-6. Preserve any citations in the memos, which will be annotated in brackets, for example [1] or [2].
-7. Create a final, consolidated list of sources and add to a Sources section with the `## Sources` header.
-8. List your sources in order and do not repeat.
+1. Target around 100 words each, crisply previewing (for the introduction) or recapping (for the conclusion) all of the memos.
+2. Use markdown formatting and include no pre-amble.
+3. For the introduction, create a compelling title and use the # header for the title, then use ## Introduction as the section header.
+4. For the conclusion, use ## Conclusion as the section header.
 
 Here are the memos from your analysts to build your report from:
 
 {context}"""
 
-def write_report(state: ResearchGraphState):
-    # Full set of sections
-    sections = state["sections"]
-    topic = state["topic"]
-
-    # Concat all sections together
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-
-    # Summarize the sections into a final report
-    system_message = report_writer_instructions.format(topic=topic, context=formatted_str_sections)
-    report = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")])
-    return {"content": report.content}
-
-intro_conclusion_instructions = """You are a research writer finishing a report on {topic}
-
-You will be given all of the sections of the report.
-
-You job is to write a crisp and compelling introduction or conclusion section.
-
-The user will instruct you whether to write the introduction or conclusion.
-
-Include no pre-amble for either section.
-
-Target around 100 words, crisply previewing (for introduction) or recapping (for conclusion) all of the sections of the report.
+# Plain-text requests for each part, used when the structured call fails; they share the system prompt
+report_part_requests = {
+    "introduction": "Write only the report introduction: the # title and the ## Introduction section.",
+    "content": "Write only the report body, from ## Insights through the ## Sources section.",
+    "conclusion": "Write only the ## Conclusion section of the report.",
+}
 
-Use markdown formatting.
+async def write_report_parts(system_message: SystemMessage) -> dict:
+    """ Write each part with its own plain call over the shared prompt """
+    async def write_part(request):
+        async with groq_limit:
+            return await llm.ainvoke([system_message, HumanMessage(content=request)])
 
-For your introduction, create a compelling title and use the # header for the title.
+    parts = await asyncio.gather(*(write_part(request) for request in report_part_requests.values()))
+    return {name: part.content for name, part in zip(report_part_requests, parts)}
 
-For your introduction, use ## Introduction as the section header.
-
-For your conclusion, use ## Conclusion as the section header.
-
-Here are the sections to reflect on for writing: {formatted_str_sections}"""
-
-def write_introduction(state: ResearchGraphState):
+async def write_report(state: ResearchGraphState):
+    """ Write the introduction, body and conclusion in one call over the memos """
     # Full set of sections
     sections = state["sections"]
     topic = state["topic"]
 
-    # Concat all sections together
+    # Concat all sections together, trimmed to the budget if there are many long memos
+    sections, _, usage = await ContextBudget(REPORT_CONTEXT_BUDGET, llm).fit(sections, query=topic)
     formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
 
-    # Summarize the sections into a final report
-
-    instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)
-    intro = llm.invoke([instructions]+[HumanMessage(content=f"Write the report introduction")])
-    return {"introduction": intro.content}
-
-def write_conclusion(state: ResearchGraphState):
-    # Full set of sections
-    sections = state["sections"]
-    topic = state["topic"]
-
-    # Concat all sections together
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-
-    # Summarize the sections into a final report
-
-    instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)
-    conclusion = llm.invoke([instructions]+[HumanMessage(content=f"Write the report conclusion")])
-    return {"conclusion": conclusion.content}
+    # The memos are sent once, instead of once each for the body, introduction and conclusion
+    system_message = SystemMessage(content=report_writer_instructions.format(topic=topic, context=formatted_str_sections))
+    messages = [system_message, HumanMessage(content="Write the report introduction, body and conclusion based upon these memos.")]
+    # What the three separate calls would have sent, for comparison
+    separate_input_tokens = sum(
+        count_message_tokens([system_message, HumanMessage(content=request)]) for request in report_part_requests.values()
+    )
+
+    report = None
+    structured_llm = llm.with_structured_output(ReportSynthesis)
+    try:
+        async with groq_limit:
+            report = await structured_llm.ainvoke(messages)
+    except Exception as e:
+        logging.warning(f"Structured report synthesis failed, writing the parts separately: {e}")
+
+    if report is not None:
+        parts = {"introduction": report.introduction, "content": report.content, "conclusion": report.conclusion}
+        usage = merge_usage(usage, node_usage("write_report", messages, "".join(parts.values())))
+        input_tokens, calls = count_message_tokens(messages), 1
+    else:
+        # No tool call or malformed JSON: the interviews are already paid for, so fall back rather than fail
+        parts = await write_report_parts(system_message)
+        for name, request in report_part_requests.items():
+            usage = merge_usage(usage, node_usage("write_report", [system_message, HumanMessage(content=request)], parts[name]))
+        input_tokens, calls = separate_input_tokens, len(report_part_requests)
+
+    synthesis_tokens = {
+        "input_tokens": input_tokens,
+        "memo_tokens": count_tokens(formatted_str_sections),
+        "calls": calls,
+        # Estimated against sending the prompt once per part; zero when the fallback ran
+        "input_tokens_saved_estimate": separate_input_tokens - input_tokens,
+    }
+    logging.info(f"Report synthesis tokens: {synthesis_tokens}")
+    return {**parts, "synthesis_tokens": synthesis_tokens, "token_usage": usage}
 
 def finalize_report(state: ResearchGraphState):
     """ The is the "reduce" step where we gather all the sections, combine them, and reflect on them to write the intro/conclusion """
@@ -169,20 +184,19 @@ def finalize_report(state: ResearchGraphState):
     else:
         sources = None
 
+    logging.info(f"Report token usage by node: {state.get('token_usage')}")
     final_report = state["introduction"] + "\n\n---\n\n" + content + "\n\n---\n\n" + state["conclusion"]
     if sources is not None:
         final_report += "\n\n## Sources\n" + sources
     return {"final_report": final_report}
 
-def research_graph_builder():
+def research_graph_builder(checkpointer=None):
     # Add nodes and edges
     builder = StateGraph(ResearchGraphState)
     builder.add_node("create_analysts", create_analysts)
     builder.add_node("human_feedback", human_feedback)
     builder.add_node("conduct_interview", interview_builder.compile())
     builder.add_node("write_report", write_report)
-    builder.add_node("write_introduction", write_introduction)
-    builder.add_node("write_conclusion", write_conclusion)
     builder.add_node("finalize_report", finalize_report)
 
     # Logic
@@ -190,14 +204,11 @@ def research_graph_builder():
     builder.add_edge("create_analysts", "human_feedback")
     builder.add_conditional_edges("human_feedback", initiate_all_interviews, ["create_analysts", "conduct_interview"])
     builder.add_edge("conduct_interview", "write_report")
-    builder.add_edge("conduct_interview", "write_introduction")
-    builder.add_edge("conduct_interview", "write_conclusion")
-    builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "finalize_report")
+    builder.add_edge("write_report", "finalize_report")
     builder.add_edge("finalize_report", END)
 
-    # Compile
-    memory = MemorySaver()
-    graph = builder.compile(interrupt_before=['human_feedback'], checkpointer=memory)
+    # Compile, with a persistent checkpointer when the caller provides one
+    graph = builder.compile(interrupt_before=['human_feedback'], checkpointer=checkpointer or MemorySaver())
     return graph
 
 interview_builder = interview_graph_builder()
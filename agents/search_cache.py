@@ -0,0 +1,92 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Optional
+from api.services.executors import db_executor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "cache/search_cache.sqlite")
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", 24 * 60 * 60))
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def normalize_query(query: str) -> str:
+    """
+    Case, punctuation and word order do not change what a web search returns
+    closely enough to be worth a second call.
+    """
+    return " ".join(sorted(set(WORD_PATTERN.findall(query.lower()))))
+
+
+class SearchCache:
+    """
+    Web-search results keyed by normalized query, persisted in a local
+    sqlite file and expired after `ttl` seconds.
+    """
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH, ttl: float = SEARCH_CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS searches (key TEXT PRIMARY KEY, query TEXT, results TEXT, expires_at REAL)"
+            )
+        return self._connection
+
+    @staticmethod
+    def key(query: str) -> str:
+        return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+    def get(self, query: str) -> Optional[List[dict]]:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT results FROM searches WHERE key = ? AND expires_at > ?", (self.key(query), time.time())
+            ).fetchone()
+            # Counted under the lock: lookups run concurrently on executor threads
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, query: str, results: List[dict]):
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO searches (key, query, results, expires_at) VALUES (?, ?, ?, ?)",
+                (self.key(query), query, json.dumps(results), time.time() + self.ttl),
+            )
+            # Drop expired rows as we go so the file stays small
+            self.connection.execute("DELETE FROM searches WHERE expires_at <= ?", (time.time(),))
+
+    async def aget(self, query: str) -> Optional[List[dict]]:
+        return await db_executor.run(self.get, query)
+
+    async def aset(self, query: str, results: List[dict]):
+        await db_executor.run(self.set, query, results)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {"hits": hits, "misses": misses, "hit_ratio": hits / lookups if lookups else 0.0}
+
+
+# Shared cache for the process
+search_cache = SearchCache()
@@ -0,0 +1,43 @@
+import os
+from functools import lru_cache
+import tiktoken
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Mixtral's own tokenizer is not in tiktoken; cl100k_base counts within a few percent of it
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    return tiktoken.get_encoding(TOKEN_ENCODING)
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text or "", disallowed_special=()))
+
+def count_message_tokens(messages) -> int:
+    """
+    Tokens in a list of chat messages (or plain strings), including a small
+    per-message overhead for roles and separators.
+    """
+    total = 0
+    for message in messages:
+        content = message if isinstance(message, str) else message.content
+        total += count_tokens(content if isinstance(content, str) else str(content)) + 4
+    return total
+
+def node_usage(node: str, messages, output: str = "") -> dict:
+    """
+    Token counts for one LLM call, keyed by node, for the `token_usage` state key.
+    """
+    return {node: {"calls": 1, "input_tokens": count_message_tokens(messages), "output_tokens": count_tokens(output)}}
+
+def merge_usage(existing: dict, new: dict) -> dict:
+    """
+    Reducer summing per-node token counts across turns and parallel branches.
+    """
+    merged = dict(existing or {})
+    for node, counts in (new or {}).items():
+        current = merged.get(node, {})
+        merged[node] = {key: current.get(key, 0) + counts.get(key, 0) for key in set(current) | set(counts)}
+    return merged
@@ -7,20 +7,35 @@ from api.models.get_database_collection import get_collections
 from pymongo.errors import DuplicateKeyError
 from jose import JWTError, jwt
 import os
+import time
 from fastapi.security import OAuth2PasswordBearer  
+from api.services.executors import auth_executor
+from api.services.cache import TTLCache
 
 # Load environment variables
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 1024))
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
 
 # MongoDB collections
 users_collections = get_collections().get("users")
 projects_collections = get_collections().get("projects")
 
 # Password hash 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes below the configured cost are upgraded on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+# Authenticated users keyed by (username, token), invalidated on user writes
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
 
 # User Model
 class User(BaseModel):
@@ -57,16 +72,25 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-# User retrieval and authentication
-def get_user(username: str) -> Optional[UserInDB]:
-    user_data = users_collections.find_one({"username": username})
-    if user_data:
-        return UserInDB(**user_data)
+def verify_and_update_password(plain_password, hashed_password):
+    # Returns (valid, new_hash), where new_hash is set when the stored hash is outdated
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+# User authentication
+async def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
+    user = await get_user(username)
+    if not user:
+        return None
 
-def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
-    user = get_user(username)
-    if not user or not verify_password(password, user.hashed_password):
+    valid, new_hash = await auth_executor.run(verify_and_update_password, password, user.hashed_password)
+    if not valid:
         return None
+
+    # Transparently rehash passwords stored with an older cost factor
+    if new_hash:
+        await users_collections.update_one({"username": username}, {"$set": {"hashed_password": new_hash}})
+        user.hashed_password = new_hash
+        invalidate_user(username)
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -77,7 +101,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 # Create a new user
-def create_user(
+async def create_user(
     firstName: str, lastName: str, username: str, password: str,
     email: Optional[str] = None, phoneNumber: Optional[str] = None,
     address: Optional[str] = None, emergencyContact: Optional[str] = None, organization: Optional[str] = None, 
@@ -85,7 +109,7 @@ def create_user(
     projectsInvolved: Optional[List[str]] = None
 ):
     # Hash the password
-    hashed_password = get_password_hash(password)
+    hashed_password = await auth_executor.run(get_password_hash, password)
 
     # If projectsInvolved is provided, fetch the project names from the database
     if projectsInvolved:
@@ -100,7 +124,7 @@ def create_user(
         # Create a list of dictionaries with projectId and projectName
         projectsInvolved = [
             {"projectId": str(project["_id"]), "projectName": project["projectName"]}
-            for project in projects
+            async for project in projects
         ]
     else:
         projectsInvolved = []  
@@ -124,7 +148,7 @@ def create_user(
 
     try:
         # Insert user into MongoDB
-        result = users_collections.insert_one(new_user)
+        result = await users_collections.insert_one(new_user)
 
         # Add the generated _id to the new_user dictionary
         new_user['id'] = str(result.inserted_id)  # Convert ObjectId to string
@@ -133,8 +157,19 @@ def create_user(
     except DuplicateKeyError:
         raise ValueError("Username already taken")
 
+def invalidate_user(username: str):
+    # Drop every cached principal of this user, whatever token it was cached under
+    principal_cache.invalidate(lambda key: key[0] == username)
+
 # Get current user from token
-async def get_current_user(token: str, oauth2_scheme):
+async def get_current_user(token: str, oauth2_scheme, claims_only: bool = False):
+    """
+    Resolve the user behind a JWT.
+
+    With `claims_only`, the verified token claims are returned without a
+    database lookup. The claims carry no disabled flag, so use it only for
+    read-only routes that need nothing but the username.
+    """
     exception = JWTError()
     try:
         # Decode the JWT token
@@ -148,16 +183,28 @@ async def get_current_user(token: str, oauth2_scheme):
     except JWTError:
         raise exception
 
-    
-    user = get_user(username=token_data.username)
+    if claims_only:
+        return token_data
+
+    cache_key = (token_data.username, token)
+    user = principal_cache.get(cache_key)
+    if user is not None:
+        return user
+
+    user = await get_user(username=token_data.username)
     if user is None:
         raise exception
 
+    # Never keep a principal cached past its token's expiry
+    ttl = min(PRINCIPAL_CACHE_TTL_SECONDS, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        principal_cache.set(cache_key, user, ttl=ttl)
+
     return user
 
 # Update the user's profile in the database
-def update_user_profile(username: str, user_data: dict) -> UserInDB:
-    user = get_user(username)
+async def update_user_profile(username: str, user_data: dict) -> UserInDB:
+    user = await get_user(username)
 
     if not user:
         raise ValueError("User not found")
@@ -170,21 +217,23 @@ def update_user_profile(username: str, user_data: dict) -> UserInDB:
     update_fields = {key: value for key, value in user_data.items() if value is not None}
 
     # Update the user's data in MongoDB
-    users_collections.update_one(
+    await users_collections.update_one(
         {"username": username},
         {"$set": update_fields}
     )
+    invalidate_user(username)
 
     # Fetch the updated user
-    updated_user_data = users_collections.find_one({"username": username})
+    updated_user_data = await users_collections.find_one({"username": username})
 
     # Add 'id' from '_id' if missing
     updated_user_data['id'] = str(updated_user_data['_id'])  # Convert ObjectId to string
 
     return UserInDB(**updated_user_data)
 
-def get_user(username: str) -> Optional[UserInDB]:
-    user_data = users_collections.find_one({"username": username})
+# User retrieval
+async def get_user(username: str) -> Optional[UserInDB]:
+    user_data = await users_collections.find_one({"username": username})
     if user_data:
         # Add the '_id' field to the user model
         user_data['id'] = str(user_data['_id'])  
@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class ClimateLocation(BaseModel):
+    name: Optional[str] = None  # District or project location label
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+class BatchForecastRequest(BaseModel):
+    locations: List[ClimateLocation] = Field(..., min_length=1, max_length=50)
@@ -0,0 +1,19 @@
+# api/models/file_lock.py
+import os
+import fcntl
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive advisory lock on `path`, shared by every process (and every
+    open of the file) on the host. Used around writes to on-disk indexes.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
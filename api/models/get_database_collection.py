@@ -5,3 +5,7 @@ from api.models.database import mongo_client
 def get_collections():
     collections = mongo_client.get_collections()
     return collections
+
+# Blocking collections for libraries without async support
+def get_sync_collections():
+    return mongo_client.get_sync_collections()
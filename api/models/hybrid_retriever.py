@@ -0,0 +1,95 @@
+# api/models/hybrid_retriever.py
+import os
+from typing import Dict, List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from api.models.lexical_index import BM25Index, tokenize
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Candidates taken from each ranking before fusion
+RETRIEVER_FETCH_K = int(os.getenv("RETRIEVER_FETCH_K", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+# Weight of query-term coverage against the fused rank when reranking
+RERANK_COVERAGE_WEIGHT = float(os.getenv("RERANK_COVERAGE_WEIGHT", 0.5))
+
+
+def doc_key(doc: Document) -> str:
+    return str(doc.metadata.get("_id") or doc.metadata.get("content_hash") or hash(doc.page_content))
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = RRF_K) -> Dict[str, tuple]:
+    """
+    Fuse several rankings: each document scores sum(1 / (k + rank)) over the
+    rankings it appears in. Returns {key: (document, score)}.
+    """
+    fused: Dict[str, tuple] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc_key(doc)
+            existing, score = fused.get(key, (doc, 0.0))
+            fused[key] = (existing, score + 1.0 / (k + rank))
+    return fused
+
+def coverage_weights(query: str, lexical_index: BM25Index) -> Dict[str, float]:
+    terms = set(tokenize(query))
+    if not len(lexical_index):
+        return {term: 1.0 for term in terms}
+    return {term: lexical_index.idf(term) for term in terms}
+
+def query_coverage(text: str, weights: Dict[str, float]) -> float:
+    """
+    IDF-weighted share of the query's terms that appear in the text.
+    """
+    total_weight = sum(weights.values())
+    if not total_weight:
+        return 0.0
+    terms = set(tokenize(text))
+    return sum(weight for term, weight in weights.items() if term in terms) / total_weight
+
+def rerank(query: str, fused: Dict[str, tuple], lexical_index: BM25Index) -> List[Document]:
+    """
+    Cheap local rerank: the fused score, normalized, plus the IDF-weighted
+    share of the query's terms that the chunk contains. Rare terms such as
+    acronyms and place names dominate the coverage term.
+    """
+    if not fused:
+        return []
+    weights = coverage_weights(query, lexical_index)
+    best_fused = max(score for _, score in fused.values())
+
+    scored = [
+        (score / best_fused + RERANK_COVERAGE_WEIGHT * query_coverage(doc.page_content, weights), doc)
+        for doc, score in fused.values()
+    ]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [doc for _, doc in scored]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25 and vector search over the same chunks, fused with reciprocal-rank
+    fusion and reranked locally. Falls back to vector-only results while the
+    lexical index is empty.
+    """
+
+    vector_store: VectorStore
+    lexical_index: BM25Index
+    k: int = 3
+    fetch_k: int = RETRIEVER_FETCH_K
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def search(self, query: str, embedding: Optional[List[float]] = None, k: Optional[int] = None) -> List[Document]:
+        if embedding is None:
+            embedding = self.vector_store.embeddings.embed_query(query)
+        vector_docs = self.vector_store.similarity_search_by_vector(embedding, k=self.fetch_k)
+        lexical_docs = [doc for doc, _ in self.lexical_index.search(query, k=self.fetch_k)]
+        fused = reciprocal_rank_fusion([vector_docs, lexical_docs])
+        return rerank(query, fused, self.lexical_index)[:k or self.k]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search(query)
@@ -0,0 +1,261 @@
+# api/models/lexical_index.py
+"""
+BM25 inverted index over the chunks in the `embeddings` collection.
+
+The ingestion pipeline adds new chunks as it inserts them. To (re)build the
+index from the collection:
+
+    python -m api.models.lexical_index build
+"""
+import os
+import re
+import math
+import pickle
+import argparse
+import time
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from api.models.file_lock import file_lock
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "cache/lexical_index.pkl")
+# How often a worker checks whether another process has added to the index
+LEXICAL_INDEX_REFRESH_SECONDS = float(os.getenv("LEXICAL_INDEX_REFRESH_SECONDS", 5))
+# The log is folded into a new snapshot once it holds this many entries, or a quarter of the documents
+LEXICAL_INDEX_LOG_MIN_ENTRIES = int(os.getenv("LEXICAL_INDEX_LOG_MIN_ENTRIES", 1000))
+BM25_K1 = float(os.getenv("BM25_K1", 1.5))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+
+# Words in any script; Devanagari vowel signs and viramas are marks, not \w, so the block is added explicitly
+TOKEN_PATTERN = re.compile(r"[\w\u0900-\u0963\u0966-\u097F]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    # Acronyms and place names ("NAPA", "Karnali") survive as single lowercase tokens
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def document_key(record: dict) -> str:
+    return str(record.get("_id") or record.get("content_hash"))
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class BM25Index:
+    """
+    In-memory inverted index with BM25 scoring. Documents can be added
+    incrementally; existing keys are ignored.
+
+    The index is persisted as a pickled snapshot plus an append-only log of
+    later additions, so saving after each ingested file writes only what
+    was added. Every process watches both files and picks up additions made
+    by other workers or by a CLI run; writers serialize on a sidecar lock file.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH, refresh_seconds: float = LEXICAL_INDEX_REFRESH_SECONDS):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.lock_path = f"{path}.lock"
+        self.refresh_seconds = refresh_seconds
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.lengths: Dict[str, int] = {}
+        self.documents: Dict[str, Tuple[str, dict]] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+        # Added here but not yet written to disk, as (key, text, metadata)
+        self._unsaved: List[tuple] = []
+        self._snapshot_stamp = None
+        self._log_offset = 0
+        self._log_entries = 0
+        self._checked_at = 0.0
+
+    @classmethod
+    def load(cls, path: str = LEXICAL_INDEX_PATH) -> "BM25Index":
+        index = cls(path)
+        index._load_snapshot()
+        return index
+
+    def _reset(self):
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        self.documents = {}
+        self.total_length = 0
+        self._log_offset = 0
+        self._log_entries = 0
+
+    def _load_snapshot(self):
+        self._reset()
+        self._snapshot_stamp = file_stamp(self.path)
+        if self._snapshot_stamp is not None:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            self.postings = defaultdict(dict, state["postings"])
+            self.lengths = state["lengths"]
+            self.documents = state["documents"]
+            self.total_length = sum(self.lengths.values())
+        self._read_log()
+
+    def _read_log(self):
+        """
+        Apply log batches appended since the last read. A batch still being
+        written is left for the next read.
+        """
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            while True:
+                try:
+                    batch = pickle.load(f)
+                except (EOFError, ValueError, pickle.UnpicklingError):
+                    break
+                for key, text, metadata in batch:
+                    self._index(key, text, metadata)
+                self._log_offset = f.tell()
+                self._log_entries += len(batch)
+
+    def refresh(self, force: bool = False):
+        """
+        Pick up a snapshot rewritten, or log batches appended, by another process.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            self._checked_at = now
+            if file_stamp(self.path) != self._snapshot_stamp:
+                unsaved = self._unsaved
+                self._load_snapshot()
+                # Keep what this process added but has not saved yet
+                for key, text, metadata in unsaved:
+                    self._index(key, text, metadata)
+                self._unsaved = unsaved
+            elif (file_stamp(self.log_path) or (0, 0))[1] > self._log_offset:
+                self._read_log()
+
+    def save(self):
+        """
+        Append unsaved additions to the log, folding the log into a new
+        snapshot once it holds more than a quarter of the documents.
+        """
+        with self._lock, file_lock(self.lock_path):
+            # Under the file lock no other process writes, so after this read
+            # neither a new snapshot nor our log offset can skip their additions
+            self.refresh(force=True)
+            log_limit = max(LEXICAL_INDEX_LOG_MIN_ENTRIES, len(self.documents) // 4)
+            if self._snapshot_stamp is None or self._log_entries + len(self._unsaved) > log_limit:
+                self._write_snapshot()
+            elif self._unsaved:
+                # One write per batch, so a concurrent reader sees whole batches or none
+                with open(self.log_path, "ab") as f:
+                    f.write(pickle.dumps(self._unsaved, protocol=pickle.HIGHEST_PROTOCOL))
+                    self._log_offset = f.tell()
+                self._log_entries += len(self._unsaved)
+            self._unsaved = []
+
+    def rebuild(self):
+        """
+        Write everything indexed in this process as a new snapshot.
+        """
+        with self._lock, file_lock(self.lock_path):
+            self._write_snapshot()
+            self._unsaved = []
+
+    def _write_snapshot(self):
+        # Callers hold the file lock
+        state = {"postings": dict(self.postings), "lengths": self.lengths, "documents": self.documents}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        # The snapshot now holds every logged document
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self._snapshot_stamp = file_stamp(self.path)
+        self._log_offset = 0
+        self._log_entries = 0
+
+    def _index(self, key: str, text: str, metadata: dict) -> bool:
+        if key in self.documents:
+            return False
+        tokens = tokenize(text)
+        for term, frequency in Counter(tokens).items():
+            self.postings[term][key] = frequency
+        self.lengths[key] = len(tokens)
+        self.total_length += len(tokens)
+        self.documents[key] = (text, metadata)
+        return True
+
+    def add(self, records: Iterable[dict]) -> int:
+        """
+        Index stored chunk records (text plus flat metadata, as in the embeddings collection).
+        """
+        added = 0
+        with self._lock:
+            for record in records:
+                key = document_key(record)
+                metadata = {name: value for name, value in record.items() if name not in ("text", "embedding")}
+                metadata["_id"] = str(metadata.get("_id") or key)
+                if self._index(key, record["text"], metadata):
+                    self._unsaved.append((key, record["text"], metadata))
+                    added += 1
+        return added
+
+    def idf(self, term: str) -> float:
+        n = len(self.documents)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[Document, float]]:
+        self.refresh()
+        with self._lock:
+            if not self.documents:
+                return []
+            average_length = self.total_length / len(self.documents)
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = self.idf(term)
+                for key, frequency in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[key] / average_length)
+                    scores[key] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [
+                (Document(page_content=self.documents[key][0], metadata=dict(self.documents[key][1])), score)
+                for key, score in top
+            ]
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--out", default=LEXICAL_INDEX_PATH)
+    args = parser.parse_args()
+
+    from api.models.get_database_collection import get_sync_collections
+    index = BM25Index(args.out)
+    index.add(get_sync_collections().get("embeddings").find({}, {"embedding": 0}))
+    index.rebuild()
+    print(f"Indexed {len(index)} documents into {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+# api/models/local_index.py
+"""
+In-process vector index over the embeddings corpus.
+
+Vectors are stored as a normalized float32 NumPy matrix, grouped into the
+posting lists of an IVF index, and memory-mapped on load. Chunks ingested
+after a build are appended to their nearest list until the next rebuild;
+every process reloads the index when another one saves or rebuilds it.
+Build it from the `embeddings` collection, or from a mongoexport JSONL dump of it:
+
+    python -m api.models.local_index build --out cache/vector_index
+    python -m api.models.local_index build --from-file embeddings.jsonl
+"""
+import os
+import json
+import uuid
+import argparse
+import time
+import threading
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from api.models.file_lock import file_lock
+from api.models.lexical_index import file_stamp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "cache/vector_index")
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", 8))
+# How often a worker checks whether another process has saved or rebuilt the index
+LOCAL_INDEX_REFRESH_SECONDS = float(os.getenv("LOCAL_INDEX_REFRESH_SECONDS", 5))
+
+# Below this size a flat scan is faster than probing lists
+FLAT_INDEX_MAX_VECTORS = 2048
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+def train_centroids(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means: centroids are kept unit length so assignment is a dot product.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(n_lists):
+            members = vectors[assignments == i]
+            # Re-seed empty lists from a random vector
+            centroids[i] = members.mean(axis=0) if len(members) else vectors[rng.integers(len(vectors))]
+        centroids = normalize_rows(centroids)
+    return centroids
+
+
+def save_array(path: str, array: np.ndarray):
+    # Write to a temporary file and rename, so a reader never maps a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+def read_documents(path: str) -> List[Document]:
+    documents = []
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            documents.append(Document(page_content=record["text"], metadata=record["metadata"]))
+    return documents
+
+def index_lock_path(path: str) -> str:
+    return os.path.join(path, "index.lock")
+
+def save_documents(path: str, documents: Iterable[Document]):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        for doc in documents:
+            f.write(json.dumps({"text": doc.page_content, "metadata": doc.metadata}, default=str) + "\n")
+    os.replace(tmp_path, path)
+
+
+class LocalVectorIndex(VectorStore):
+    """
+    IVF index over a memory-mapped embedding matrix, exposing the LangChain
+    VectorStore interface (and so `as_retriever(search_kwargs={'k': ...})`).
+
+    Vectors added after the build are assigned to their nearest list and kept
+    in a small in-memory segment (persisted by `save`) until the next rebuild.
+    Writers serialize on a lock file in the index directory, and `save`
+    reloads what other processes wrote before writing, so none of their
+    additions are overwritten.
+    """
+
+    def __init__(self, embedding: Embeddings, vectors: np.ndarray, centroids: np.ndarray,
+                 offsets: np.ndarray, documents: List[Document], n_probe: int = LOCAL_INDEX_NPROBE,
+                 path: Optional[str] = None, appended_vectors: Optional[np.ndarray] = None,
+                 appended_lists: Optional[np.ndarray] = None, refresh_seconds: float = LOCAL_INDEX_REFRESH_SECONDS):
+        self._embedding = embedding
+        self.n_probe = n_probe
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._set_state(vectors, centroids, offsets, documents, appended_vectors, appended_lists)
+
+        # Added here but not yet written to disk, as (text, vector, metadata)
+        self._unsaved: List[tuple] = []
+        self._stamp = self._disk_stamp()
+        self._checked_at = time.monotonic()
+
+    def _set_state(self, vectors, centroids, offsets, documents, appended_vectors=None, appended_lists=None):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.documents = documents
+        # Replaced as one tuple so a concurrent search sees a consistent segment
+        self._appended = (
+            appended_vectors if appended_vectors is not None else np.zeros((0, centroids.shape[1]), dtype=np.float32),
+            appended_lists if appended_lists is not None else np.zeros(0, dtype=np.int64),
+        )
+
+    def _disk_stamp(self):
+        # Every save and build rewrites the documents file
+        return file_stamp(os.path.join(self.path, "documents.jsonl")) if self.path else None
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    @classmethod
+    def build(cls, texts: List[str], vectors, metadatas: Optional[List[dict]], embedding: Embeddings,
+              path: str = LOCAL_INDEX_DIR, n_lists: Optional[int] = None) -> "LocalVectorIndex":
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        metadatas = metadatas or [{} for _ in texts]
+
+        if n_lists is None:
+            n_lists = 1 if len(vectors) <= FLAT_INDEX_MAX_VECTORS else int(np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, len(vectors)))
+
+        if n_lists == 1:
+            centroids = normalize_rows(vectors.mean(axis=0, keepdims=True))
+            assignments = np.zeros(len(vectors), dtype=np.int64)
+        else:
+            centroids = train_centroids(vectors, n_lists)
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+
+        # Store each posting list contiguously so a probe reads one slice
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]).astype(np.int64)
+
+        os.makedirs(path, exist_ok=True)
+        with file_lock(index_lock_path(path)):
+            save_array(os.path.join(path, "vectors.npy"), vectors[order])
+            save_array(os.path.join(path, "centroids.npy"), centroids)
+            save_array(os.path.join(path, "offsets.npy"), offsets)
+            # A rebuild folds in everything appended since the last one
+            save_array(os.path.join(path, "appended_vectors.npy"), np.zeros((0, vectors.shape[1]), dtype=np.float32))
+            save_array(os.path.join(path, "appended_lists.npy"), np.zeros(0, dtype=np.int64))
+            save_documents(
+                os.path.join(path, "documents.jsonl"),
+                (Document(page_content=texts[i], metadata=metadatas[i]) for i in order),
+            )
+
+        return cls.load(path, embedding)
+
+    @staticmethod
+    def _read_state(path: str) -> dict:
+        appended_path = os.path.join(path, "appended_vectors.npy")
+        has_appended = os.path.exists(appended_path)
+        return {
+            "vectors": np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"),
+            "centroids": np.load(os.path.join(path, "centroids.npy")),
+            "offsets": np.load(os.path.join(path, "offsets.npy")),
+            "documents": read_documents(os.path.join(path, "documents.jsonl")),
+            "appended_vectors": np.load(appended_path) if has_appended else None,
+            "appended_lists": np.load(os.path.join(path, "appended_lists.npy")) if has_appended else None,
+        }
+
+    @classmethod
+    def load(cls, path: str = LOCAL_INDEX_DIR, embedding: Optional[Embeddings] = None,
+             n_probe: int = LOCAL_INDEX_NPROBE) -> "LocalVectorIndex":
+        # Under the lock, so the files read all come from the same save
+        with file_lock(index_lock_path(path)):
+            return cls(embedding=embedding, n_probe=n_probe, path=path, **cls._read_state(path))
+
+    def _reload(self):
+        """
+        Replace the in-memory index with what is on disk, then re-append
+        unsaved additions. Callers hold both locks.
+        """
+        self._set_state(**self._read_state(self.path))
+        self._stamp = self._disk_stamp()
+        stored = {doc.metadata.get("_id") for doc in self.documents}
+        # A rebuild may have moved the centroids, so unsaved vectors are assigned to lists again
+        self._unsaved = [entry for entry in self._unsaved if entry[2]["_id"] not in stored]
+        if self._unsaved:
+            texts, vectors, metadatas = zip(*self._unsaved)
+            self._append(list(texts), np.stack(vectors), list(metadatas))
+
+    def refresh(self, force: bool = False):
+        """
+        Pick up additions saved, or a rebuild written, by another process.
+        """
+        if self.path is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_seconds:
+            return
+        self._checked_at = now
+        if self._disk_stamp() == self._stamp:
+            return
+        with self._lock, file_lock(index_lock_path(self.path)):
+            if self._disk_stamp() != self._stamp:
+                self._reload()
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        self.refresh()
+        with self._lock:
+            vectors, centroids, offsets, documents = self.vectors, self.centroids, self.offsets, self.documents
+            appended_vectors, appended_lists = self._appended
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+
+        # Probe the closest lists and score only their vectors. Each list is a
+        # contiguous slice of the memory map, so only its pages are read.
+        n_probe = min(self.n_probe, len(centroids))
+        lists = np.argsort(centroids @ query)[::-1][:n_probe]
+        scores, rows = [], []
+        for i in lists:
+            start, end = int(offsets[i]), int(offsets[i + 1])
+            if end > start:
+                scores.append(vectors[start:end] @ query)
+                rows.append(np.arange(start, end))
+
+        appended_rows = np.flatnonzero(np.isin(appended_lists, lists))
+        if len(appended_rows):
+            scores.append(appended_vectors[appended_rows] @ query)
+            # Appended documents follow the built ones
+            rows.append(len(vectors) + appended_rows)
+
+        if not scores:
+            return []
+        scores, rows = np.concatenate(scores), np.concatenate(rows)
+        top = np.argsort(scores)[::-1][:k]
+        return [(documents[rows[i]], float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1) / 2
+
+    def _append(self, texts: List[str], vectors: np.ndarray, metadatas: List[dict]):
+        # Callers hold the lock
+        lists = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int64)
+        # A new list, so a search holding the old references never sees a row without its document
+        self.documents = self.documents + [
+            Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)
+        ]
+        appended_vectors, appended_lists = self._appended
+        self._appended = (np.concatenate([appended_vectors, vectors]), np.concatenate([appended_lists, lists]))
+
+    def add_embeddings(self, texts: List[str], vectors, metadatas: Optional[List[dict]] = None) -> List[str]:
+        """
+        Append already-embedded texts, each to the list of its nearest centroid.
+        """
+        if not texts:
+            return []
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+        metadatas = [
+            {**metadata, "_id": str(metadata.get("_id") or uuid.uuid4())}
+            for metadata in (metadatas or [{} for _ in texts])
+        ]
+
+        with self._lock:
+            self._append(texts, vectors, metadatas)
+            self._unsaved.extend(zip(texts, vectors, metadatas))
+        return [metadata["_id"] for metadata in metadatas]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embedding.embed_documents(texts), metadatas)
+
+    def save(self):
+        """
+        Persist vectors appended since the build. The built matrix is unchanged.
+        """
+        if self.path is None:
+            raise ValueError("The index has no directory to save to")
+        with self._lock, file_lock(index_lock_path(self.path)):
+            # Fold in what other processes saved since our last read, so writing ours never drops theirs
+            if self._disk_stamp() != self._stamp:
+                self._reload()
+            if not self._unsaved:
+                return
+            appended_vectors, appended_lists = self._appended
+            # Documents first: extra documents are never reached, but rows without documents would be
+            save_documents(os.path.join(self.path, "documents.jsonl"), self.documents)
+            save_array(os.path.join(self.path, "appended_vectors.npy"), appended_vectors)
+            save_array(os.path.join(self.path, "appended_lists.npy"), appended_lists)
+            self._stamp = self._disk_stamp()
+            self._unsaved = []
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   **kwargs: Any) -> "LocalVectorIndex":
+        return cls.build(texts, embedding.embed_documents(texts), metadatas, embedding, **kwargs)
+
+
+def iter_export(records: Iterable[dict]):
+    """
+    Split exported embedding documents into (text, vector, metadata).
+    """
+    for record in records:
+        metadata = {key: value for key, value in record.items() if key not in ("text", "embedding", "_id")}
+        _id = record.get("_id")
+        # mongoexport writes ObjectIds as {"$oid": ...}
+        metadata["_id"] = _id.get("$oid") if isinstance(_id, dict) else str(_id)
+        yield record["text"], record["embedding"], metadata
+
+def build_from_records(records: Iterable[dict], path: str = LOCAL_INDEX_DIR, embedding: Optional[Embeddings] = None,
+                       n_lists: Optional[int] = None) -> LocalVectorIndex:
+    texts, vectors, metadatas = [], [], []
+    for text, vector, metadata in iter_export(records):
+        texts.append(text)
+        vectors.append(vector)
+        metadatas.append(metadata)
+    if not texts:
+        raise ValueError("No embeddings to index")
+    return LocalVectorIndex.build(texts, vectors, metadatas, embedding, path, n_lists)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--out", default=LOCAL_INDEX_DIR, help="Index directory")
+    parser.add_argument("--from-file", help="mongoexport JSONL dump of the embeddings collection")
+    parser.add_argument("--lists", type=int, default=None, help="Number of IVF lists (default: sqrt(N))")
+    args = parser.parse_args()
+
+    if args.from_file:
+        with open(args.from_file) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    else:
+        from api.models.get_database_collection import get_sync_collections
+        records = get_sync_collections().get("embeddings").find({})
+
+    index = build_from_records(records, args.out, n_lists=args.lists)
+    print(f"Indexed {len(index.documents)} documents into {len(index.centroids)} lists at {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -44,7 +44,7 @@ class ProjectResponse(BaseModel):
         mongo_dict['id'] = str(mongo_dict.pop('_id', None))  # Rename _id to id
         return cls(**mongo_dict)
 
-def create_project(
+async def create_project(
     projectName: str, description: str, status: str, startDate: str, 
     endDate: Optional[str] = None, donor: Optional[str] = None, 
     budget: Optional[float] = None, location: Optional[str] = None,
@@ -65,12 +65,12 @@ def create_project(
     }
 
     # Insert the new project into the projects collection
-    result = projects_collections.insert_one(new_project)
+    result = await projects_collections.insert_one(new_project)
     project_id = result.inserted_id  # Get the inserted project ID
     
     # Update each user (team member) involved in this project
     for user_data in teamMembersData:
-        users_collections.update_one(
+        await users_collections.update_one(
             {"_id": ObjectId(user_data["userId"])},
             {"$addToSet": {"projectsInvolved": {"projectId": str(project_id), "projectName": projectName}}}
         )
@@ -1,14 +1,32 @@
+import os
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import MongoDBAtlasVectorSearch
 
-def get_vector_retriever(collection):
-    ATLAS_VECTOR_SEARCH_INDEX_NAME = 'vector_index'
-    embedding_model = GoogleGenerativeAIEmbeddings(model='models/embedding-001')
-    vector_search = MongoDBAtlasVectorSearch.from_documents(
-        documents=[], 
-        embedding=embedding_model, 
-        collection=collection, 
+ATLAS_VECTOR_SEARCH_INDEX_NAME = os.getenv("ATLAS_VECTOR_SEARCH_INDEX_NAME", 'vector_index')
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", 'models/embedding-001')
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", 3))
+# "atlas" queries Atlas Vector Search, "local" the in-process index built by api.models.local_index
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", 'atlas')
+# Fuse BM25 results with the vector search (see api.models.hybrid_retriever)
+RETRIEVER_HYBRID = os.getenv("RETRIEVER_HYBRID", 'true').lower() in ('1', 'true', 'yes')
+
+def get_embedding_model():
+    return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+
+def get_vector_store(collection=None, embedding_model=None, backend: str = RETRIEVER_BACKEND):
+    embedding_model = embedding_model or get_embedding_model()
+    if backend == 'local':
+        from api.models.local_index import LocalVectorIndex, LOCAL_INDEX_DIR
+        return LocalVectorIndex.load(LOCAL_INDEX_DIR, embedding_model)
+    if backend != 'atlas':
+        raise ValueError(f"Unknown retriever backend: {backend}")
+    return MongoDBAtlasVectorSearch(
+        collection=collection,
+        embedding=embedding_model,
         index_name=ATLAS_VECTOR_SEARCH_INDEX_NAME
     )
-    retriever = vector_search.as_retriever(search_type='similarity', search_kwargs={'k': 3})
+
+def get_vector_retriever(collection=None, embedding_model=None, k: int = RETRIEVER_K, backend: str = RETRIEVER_BACKEND):
+    vector_search = get_vector_store(collection, embedding_model, backend)
+    retriever = vector_search.as_retriever(search_type='similarity', search_kwargs={'k': k})
     return retriever
@@ -0,0 +1,27 @@
+# api/routes/__init__.py
+from fastapi import HTTPException, Request, status
+from fastapi.routing import APIRoute
+from api.services.executors import ExecutorSaturated
+
+
+class LoadSheddingRoute(APIRoute):
+    """
+    Route that answers 503 with Retry-After when a bounded executor rejects
+    work, so load shedding reads as "busy" rather than a server error.
+    Routers opt in with `APIRouter(route_class=LoadSheddingRoute)`.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def shedding_handler(request: Request):
+            try:
+                return await handler(request)
+            except ExecutorSaturated as e:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=str(e),
+                    headers={"Retry-After": "1"}
+                )
+
+        return shedding_handler
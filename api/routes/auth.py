@@ -12,17 +12,28 @@ from api.models.auth import (
     oauth2_scheme,
     get_user
 )
+from api.models.database import mongo_client
+from api.routes import LoadSheddingRoute
 from typing import Optional, List
 from bson import ObjectId
 
-router = APIRouter()
+router = APIRouter(route_class=LoadSheddingRoute)
+
+# Every router depends on authentication, so the database lifecycle hangs off this one
+@router.on_event("startup")
+async def connect_database():
+    await mongo_client.startup()
+
+@router.on_event("shutdown")
+async def close_database():
+    await mongo_client.close()
 
 @router.post("/token")
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Login and get a JWT token for the user.
     """
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     
     if not user:
         raise HTTPException(
@@ -53,7 +64,7 @@ async def sign_up(
     Sign up a new user with form data (username, password, etc.)
     """
     try:
-        new_user = create_user(
+        new_user = await create_user(
             firstName=firstName,
             lastName=lastName,
             username=username,
@@ -130,7 +141,7 @@ async def update_profile(
 
 
     try:
-        updated_user = update_user_profile(current_user.username, user_data)
+        updated_user = await update_user_profile(current_user.username, user_data)
         return updated_user
     except ValueError as e:
         raise HTTPException(
@@ -149,7 +160,7 @@ async def get_user_profile(username: str, token: str = Depends(oauth2_scheme)):
 
     # You can add role-based checks here if needed
 
-    user = get_user(username)
+    user = await get_user(username)
 
     if not user:
         raise HTTPException(
@@ -1,14 +1,63 @@
 # api/routes/chatbot.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from api.models.auth import get_current_user
-from api.services.question_service import process_question
+from api.services.question_service import process_question, stream_question
 from api.models.auth import oauth2_scheme
+from api.services.executors import llm_executor
+from api.services.chain_registry import chain_registry
+from api.services.semantic_cache import watch_corpus_changes
+from api.models.get_database_collection import get_collections
+from api.routes import LoadSheddingRoute
+import asyncio
+import json
 
-router = APIRouter()
+router = APIRouter(route_class=LoadSheddingRoute)
+
+corpus_watcher = None
+
+@router.on_event("startup")
+async def warm_chain_registry():
+    global corpus_watcher
+    await llm_executor.run(chain_registry.warm)
+    # Cached answers are only valid for the corpus they were generated from
+    corpus_watcher = asyncio.create_task(watch_corpus_changes(get_collections().get('embeddings')))
+
+@router.on_event("shutdown")
+async def stop_corpus_watcher():
+    if corpus_watcher:
+        corpus_watcher.cancel()
 
 @router.get("/question")
 async def ask_question(user_input: str, token: str = Depends(oauth2_scheme)):
     current_user = await get_current_user(token, oauth2_scheme)
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return {"answer": process_question(user_input)}
+    return {"answer": await llm_executor.run(process_question, user_input)}
+
+@router.get("/question/stream")
+async def ask_question_stream(request: Request, user_input: str, token: str = Depends(oauth2_scheme)):
+    current_user = await get_current_user(token, oauth2_scheme)
+    if current_user.disabled:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    if not user_input:
+        raise HTTPException(status_code=400, detail="User input is required")
+
+    async def events():
+        stream = stream_question(user_input)
+        try:
+            async for event in stream:
+                # Stop generating (and paying for tokens) once the client is gone
+                if await request.is_disconnected():
+                    break
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            else:
+                yield "event: done\ndata: {}\n\n"
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,66 +1,87 @@
 # api/routes/climate_change.py
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-import pandas as pd
-from datetime import timedelta
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+import asyncio
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from api.models.auth import oauth2_scheme, get_current_user
-from api.services.load_climate_data import get_climate_data 
-import joblib
-from sklearn.preprocessing import QuantileTransformer
+from api.models.climate import BatchForecastRequest
+from api.services.climate_forecast import forecast_store, run_forecast_scheduler, compute_batch_forecast
+from api.services.load_climate_data import get_climate_data_many
+from api.services.executors import cpu_executor, http_executor
+from api.routes import LoadSheddingRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=LoadSheddingRoute)
 
-model_temp = joblib.load('models/xgboost_temp_model.pkl')
-model_precip = joblib.load('models/xgboost_precip_model.pkl')
-qt = QuantileTransformer(output_distribution='normal')
+scheduler_task = None
+
+@router.on_event("startup")
+async def start_forecast_scheduler():
+    global scheduler_task
+    scheduler_task = asyncio.create_task(run_forecast_scheduler())
+
+@router.on_event("shutdown")
+async def stop_forecast_scheduler():
+    if scheduler_task:
+        scheduler_task.cancel()
+
+def not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return False
+    return False
 
 @router.get("/forecast_climate_change_prediction")
-async def forecast(token: str = Depends(oauth2_scheme)):
+async def forecast(request: Request, token: str = Depends(oauth2_scheme)):
+    current_user = await get_current_user(token, oauth2_scheme)
+    if current_user.disabled:
+        raise HTTPException(status_code=400, detail="Inactive user")
+
+    # Serve the materialized forecast, computing it only on a cold start
+    entry = await http_executor.run(forecast_store.latest)
+
+    etag = f'"{entry["version"]}"'
+    last_modified = datetime.fromisoformat(entry["generated_at"])
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(content=entry["data"], headers=headers)
+
+@router.post("/forecast_climate_change_prediction/batch")
+async def forecast_batch(request: BatchForecastRequest, token: str = Depends(oauth2_scheme)):
     current_user = await get_current_user(token, oauth2_scheme)
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
-    
-    # Retrieve climate data
-    climate_change_df = get_climate_data()
-
-    # Transform Precipitation
-    climate_change_df['Transformed_Precipitation'] = qt.fit_transform(climate_change_df[['Precipitation']])
-
-    # Generate dates for the next 10 days
-    last_date = climate_change_df.index[-1]
-    future_dates = [last_date + timedelta(days=i) for i in range(1, 11)]
-
-    future_df = pd.DataFrame(index=future_dates)
-    future_df['month'] = future_df.index.month
-    future_df['dayofyear'] = future_df.index.dayofyear
-    future_df['dayofmonth'] = future_df.index.day
-    future_df['dayofweek'] = future_df.index.dayofweek
-
-    # Add lag features
-    for lag in range(1, 4):
-        future_df[f'temp_lag_{lag}'] = climate_change_df['Temperature'].shift(lag).iloc[-1]
-        future_df[f'precip_lag_{lag}'] = climate_change_df['Precipitation'].shift(lag).iloc[-1]
-
-    future_df['temp_roll_mean'] = climate_change_df['Temperature'].rolling(window=7).mean().iloc[-1]
-    future_df['precip_roll_mean'] = climate_change_df['Precipitation'].rolling(window=7).mean().iloc[-1]
-    future_df['precip_diff'] = climate_change_df['Precipitation'].diff().iloc[-1]
-    future_df['precip_pct_change'] = climate_change_df['Precipitation'].pct_change().iloc[-1]
-
-    feature_names = model_temp.get_booster().feature_names
-    future_df = future_df[feature_names]
-
-    # Make predictions
-    future_temp_predictions = model_temp.predict(future_df)
-    future_precip_predictions = model_precip.predict(future_df)
-    future_precip_predictions = qt.inverse_transform(future_precip_predictions.reshape(-1, 1)).flatten()
-
-    # Prepare final output
-    future_predictions_df = pd.DataFrame({
-        'Date': future_dates,
-        'Predicted_Temperature': future_temp_predictions,
-        'Predicted_Precipitation': future_precip_predictions
-    })
-
-    future_predictions_df['Date'] = future_predictions_df['Date'].dt.strftime('%Y-%m-%d')
-    return future_predictions_df.to_dict(orient="records")
+
+    # Fetch every location's series concurrently
+    locations = request.locations
+    frames = await get_climate_data_many([(location.latitude, location.longitude) for location in locations])
+
+    # Predict all successfully fetched locations in one vectorized pass
+    fetched = [i for i, frame in enumerate(frames) if not isinstance(frame, Exception)]
+    forecasts = dict(zip(fetched, await cpu_executor.run(compute_batch_forecast, [frames[i] for i in fetched])))
+
+    results = []
+    for i, location in enumerate(locations):
+        result = location.model_dump()
+        if i in forecasts:
+            result["forecast"] = forecasts[i]
+        else:
+            result["error"] = str(frames[i])
+        results.append(result)
+
+    return {"data": results}
@@ -7,8 +7,9 @@ from api.models.auth import oauth2_scheme, get_current_user
 from api.models.community import CommunityPost, CommunityPostCreate, Comment
 from api.models.get_database_collection import get_collections
 from api.services.notification import create_notifications  
+from api.routes import LoadSheddingRoute
 
-router = APIRouter()
+router = APIRouter(route_class=LoadSheddingRoute)
 
 community_collection = get_collections().get('community')
 
@@ -17,7 +18,7 @@ async def get_community_posts(token: str = Depends(oauth2_scheme)):
     posts_cursor = community_collection.find({})
     posts = []
 
-    for post in posts_cursor:
+    async for post in posts_cursor:
         post['id'] = str(post.pop('_id'))  
 
         # Fix: Ensure we use the comment's existing 'id' (not regenerate it)
@@ -30,7 +31,7 @@ async def get_community_posts(token: str = Depends(oauth2_scheme)):
 
 @router.get("/community/posts/{post_id}/", response_model=CommunityPost)
 async def get_community_post_by_id(post_id: str, token: str = Depends(oauth2_scheme)):
-    post = community_collection.find_one({"_id": ObjectId(post_id)})
+    post = await community_collection.find_one({"_id": ObjectId(post_id)})
     
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -46,7 +47,10 @@ async def get_community_post_by_id(post_id: str, token: str = Depends(oauth2_sch
 # Create a new community post
 @router.post("/community/posts/", response_model=CommunityPost)
 async def create_community_post(post: CommunityPostCreate, token: str = Depends(oauth2_scheme)):
+    # Writes resolve the stored user, so a disabled account cannot keep posting on a live token
     current_user = await get_current_user(token, oauth2_scheme)
+    if current_user.disabled:
+        raise HTTPException(status_code=400, detail="Inactive user")
 
     # Create the new post
     new_post = {
@@ -58,11 +62,11 @@ async def create_community_post(post: CommunityPostCreate, token: str = Depends(
     }
 
     # Insert the post into the database
-    result = community_collection.insert_one(new_post)
+    result = await community_collection.insert_one(new_post)
     new_post['id'] = str(result.inserted_id)  # Add the new post ID
 
     # Create notifications for any tagged users in the post content
-    create_notifications(new_post['id'], post.content, current_user.username)
+    await create_notifications(new_post['id'], post.content, current_user.username)
 
     return new_post
 
@@ -74,7 +78,10 @@ async def add_comment_to_post(
     comment: Comment, 
     token: str = Depends(oauth2_scheme)
 ):
+    # Writes resolve the stored user, so a disabled account cannot keep posting on a live token
     current_user = await get_current_user(token, oauth2_scheme)
+    if current_user.disabled:
+        raise HTTPException(status_code=400, detail="Inactive user")
 
     # Create the comment data
     comment_data = {
@@ -85,7 +92,7 @@ async def add_comment_to_post(
     }
 
     # Update the post with the new comment
-    update_result = community_collection.update_one(
+    update_result = await community_collection.update_one(
         {"_id": ObjectId(post_id)},
         {"$push": {"comments": comment_data}}  # Add comment to the post's "comments" array
     )
@@ -94,17 +101,17 @@ async def add_comment_to_post(
         raise HTTPException(status_code=404, detail="Post not found or comment already added")
     
     # Create notifications for tagged users in the comment content
-    create_notifications(post_id, comment_data['content'], current_user.username, comment_id=comment_data['id'])
+    await create_notifications(post_id, comment_data['content'], current_user.username, comment_id=comment_data['id'])
 
     return {**comment_data, "post_id": post_id}
 
 # Get comments for a specific post
 @router.get("/community/posts/{post_id}/comments/", response_model=List[Comment])
 async def get_comments_for_post(post_id: str, token: str = Depends(oauth2_scheme)):
-    current_user = await get_current_user(token, oauth2_scheme)
+    current_user = await get_current_user(token, oauth2_scheme, claims_only=True)
 
     try:
-        post = community_collection.find_one({"_id": ObjectId(post_id)})
+        post = await community_collection.find_one({"_id": ObjectId(post_id)})
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid post ID format")
 
@@ -116,10 +123,10 @@ async def get_comments_for_post(post_id: str, token: str = Depends(oauth2_scheme
 # Get a specific comment by ID within a post
 @router.get("/community/posts/{post_id}/comments/{comment_id}/", response_model=Comment)
 async def get_comment_by_id(post_id: str, comment_id: str, token: str = Depends(oauth2_scheme)):
-    current_user = await get_current_user(token, oauth2_scheme)
+    current_user = await get_current_user(token, oauth2_scheme, claims_only=True)
 
     # Fetch the post by its ID
-    post = community_collection.find_one({"_id": ObjectId(post_id)})
+    post = await community_collection.find_one({"_id": ObjectId(post_id)})
     
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
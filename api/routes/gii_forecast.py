@@ -1,17 +1,39 @@
 # api/routes/gii_forecast.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from api.models.auth import oauth2_scheme, get_current_user
-from api.services.gii import fetch_gii_data, forecast_gii
+from api.services.gii import fetch_gii_data, aforecast_gii, load_models, stream_gii_forecasts
+from api.services.executors import db_executor, http_executor
+from api.routes import LoadSheddingRoute
+import json
 
-router = APIRouter()
+router = APIRouter(route_class=LoadSheddingRoute)
+
+@router.on_event("startup")
+async def load_gii_models():
+    # Pick up models fitted by previous workers
+    await db_executor.run(load_models)
 
 @router.get("/gii_forecast")
-async def get_gii_forecast(token: str = Depends(oauth2_scheme)):
+async def get_gii_forecast(
+    countries: Optional[List[str]] = Query(None, description='Countries to forecast, or "all"'),
+    token: str = Depends(oauth2_scheme)
+):
     current_user = await get_current_user(token, oauth2_scheme)
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
-    
-    gii_data = fetch_gii_data()  
-    forecast_results = forecast_gii(gii_data)  
-    
-    return {"data": forecast_results}
+
+    if not countries:
+        gii_data = await http_executor.run(fetch_gii_data, ["Nepal"])
+        forecast_results = await aforecast_gii(gii_data)
+        return {"data": forecast_results}
+
+    # Stream one JSON line per country as each forecast finishes
+    gii_data = await http_executor.run(fetch_gii_data, None if "all" in countries else countries)
+
+    async def forecast_lines():
+        async for result in stream_gii_forecasts(gii_data, countries):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(forecast_lines(), media_type="application/x-ndjson")
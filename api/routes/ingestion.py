@@ -0,0 +1,63 @@
+# api/routes/ingestion.py
+import os
+import uuid
+import shutil
+import asyncio
+import logging
+from typing import List
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from api.models.auth import oauth2_scheme, get_current_user
+from api.services.executors import db_executor
+from api.services.ingestion import IngestionPipeline, SUPPORTED_EXTENSIONS
+from api.routes import LoadSheddingRoute
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INGEST_UPLOAD_DIR = os.getenv("INGEST_UPLOAD_DIR", "cache/ingest/uploads")
+
+router = APIRouter(route_class=LoadSheddingRoute)
+
+# One ingestion run at a time per process; its stats are reported by /ingest/status
+ingestion_task = None
+ingestion_pipeline = None
+
+def save_upload(upload: UploadFile) -> str:
+    os.makedirs(INGEST_UPLOAD_DIR, exist_ok=True)
+    # Prefixed so uploads sharing a filename, from any user or worker, never overwrite each other
+    path = os.path.join(INGEST_UPLOAD_DIR, f"{uuid.uuid4().hex}-{os.path.basename(upload.filename)}")
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f)
+    return path
+
+async def run_ingestion(pipeline: IngestionPipeline, paths: List[str]):
+    try:
+        stats = await pipeline.run(paths)
+        logging.info(f"Ingestion finished: {stats}")
+    except Exception as e:
+        logging.error(f"Ingestion failed: {e}")
+
+@router.post("/ingest", status_code=202)
+async def ingest_documents(files: List[UploadFile] = File(...), token: str = Depends(oauth2_scheme)):
+    global ingestion_task, ingestion_pipeline
+    current_user = await get_current_user(token, oauth2_scheme)
+    if current_user.disabled:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    if ingestion_task and not ingestion_task.done():
+        raise HTTPException(status_code=409, detail="An ingestion run is already in progress")
+
+    unsupported = [f.filename for f in files if not f.filename.lower().endswith(SUPPORTED_EXTENSIONS)]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported file types: {', '.join(unsupported)}")
+
+    paths = [await db_executor.run(save_upload, upload) for upload in files]
+    ingestion_pipeline = IngestionPipeline()
+    ingestion_task = asyncio.create_task(run_ingestion(ingestion_pipeline, paths))
+    return {"message": "Ingestion started", "files": [os.path.basename(upload.filename) for upload in files]}
+
+@router.get("/ingest/status")
+async def ingestion_status(token: str = Depends(oauth2_scheme)):
+    await get_current_user(token, oauth2_scheme, claims_only=True)
+    if ingestion_pipeline is None:
+        return {"running": False, "stats": None}
+    return {"running": not ingestion_task.done(), "stats": ingestion_pipeline.stats}
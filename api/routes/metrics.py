@@ -0,0 +1,42 @@
+# api/routes/metrics.py
+from fastapi import APIRouter, Depends, HTTPException
+from api.models.auth import oauth2_scheme, get_current_user
+from api.services.executors import executor_stats
+from api.services.semantic_cache import semantic_cache
+from api.services.chain_registry import chain_registry
+from api.services.report_jobs import report_jobs
+from api.routes import LoadSheddingRoute
+from agents.search_cache import search_cache
+
+async def require_active_user(token: str = Depends(oauth2_scheme)):
+    current_user = await get_current_user(token, oauth2_scheme)
+    if current_user.disabled:
+        raise HTTPException(status_code=400, detail="Inactive user")
+
+# Metrics reveal load and usage, so every route requires an active user
+router = APIRouter(dependencies=[Depends(require_active_user)], route_class=LoadSheddingRoute)
+
+@router.get("/metrics/executors")
+async def get_executor_metrics():
+    # Queue depth, wait and run times for each workload class
+    return {"executors": executor_stats()}
+
+@router.get("/metrics/semantic_cache")
+async def get_semantic_cache_metrics():
+    # Hit ratio and generation latency saved by the chatbot answer cache
+    return {"semantic_cache": semantic_cache.stats()}
+
+@router.get("/metrics/embedding_cache")
+async def get_embedding_cache_metrics():
+    # Memory and persistent tier hits for query and document embeddings
+    return {"embedding_cache": chain_registry.embeddings.stats()}
+
+@router.get("/metrics/report_jobs")
+async def get_report_job_metrics():
+    # Background report workers and how many jobs wait for them
+    return {"report_jobs": report_jobs.stats()}
+
+@router.get("/metrics/search_cache")
+async def get_search_cache_metrics():
+    # Web searches served locally instead of by Tavily
+    return {"search_cache": search_cache.stats()}
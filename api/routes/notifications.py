@@ -2,10 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException
 from api.services.notification import notifications_collection
 from bson import ObjectId
 from api.models.notification import Notification
+from api.routes import LoadSheddingRoute
 from typing import List
 
 
-router = APIRouter()
+router = APIRouter(route_class=LoadSheddingRoute)
 
 # Get notifications for a user
 @router.get("/notifications/{user_id}", response_model=List[Notification])
@@ -26,7 +27,7 @@ async def get_notifications(user_id: str):
          "tagged_by": notification.get("tagged_by"),
          "project_id": str(notification.get("project_id")) if "project_id" in notification else None  
         }
-        for notification in notifications_cursor
+        async for notification in notifications_cursor
     ]
 
     return notifications_list
@@ -41,7 +42,7 @@ async def mark_notifications_as_read(user_id: str):
         raise HTTPException(status_code=400, detail="Invalid user_id format")
     
     # Mark notifications as read
-    result = notifications_collection.update_many(
+    result = await notifications_collection.update_many(
         {'user': user_object_id, 'is_read': False},
         {'$set': {'is_read': True}}
     )
@@ -63,7 +64,7 @@ async def mark_notification_as_read(user_id: str, notification_id: str):
         raise HTTPException(status_code=400, detail="Invalid user_id or notification_id format")
     
     # Find the specific notification by user and notification_id
-    notification = notifications_collection.find_one({
+    notification = await notifications_collection.find_one({
         '_id': notification_object_id,
         'user': user_object_id
     })
@@ -72,7 +73,7 @@ async def mark_notification_as_read(user_id: str, notification_id: str):
         raise HTTPException(status_code=404, detail="Notification not found or does not belong to the user")
 
     # Update the specific notification to mark it as read
-    result = notifications_collection.update_one(
+    result = await notifications_collection.update_one(
         {'_id': notification_object_id},
         {'$set': {'is_read': True}}
     )
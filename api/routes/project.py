@@ -5,8 +5,9 @@ from api.models.auth import oauth2_scheme, get_current_user
 from bson import ObjectId
 from api.services.project_service import update_project
 from api.services.notification import create_notifications
+from api.routes import LoadSheddingRoute
 
-router = APIRouter()
+router = APIRouter(route_class=LoadSheddingRoute)
 
 @router.post("/projects/", response_model=ProjectResponse)
 async def create_project_route(
@@ -27,7 +28,7 @@ async def create_project_route(
         team_members_data = []
 
         # Query users by username
-        users = users_collections.find({"username": {"$in": usernames}})
+        users = await users_collections.find({"username": {"$in": usernames}}).to_list(length=None)
         
         # Extract the found usernames and userIds
         found_usernames = {user["username"]: str(user["_id"]) for user in users}
@@ -47,7 +48,7 @@ async def create_project_route(
             })
         
         # Create the project with the team_members_data (already contains userId and username)
-        project = create_project(
+        project = await create_project(
             projectName=project_data.projectName,
             description=project_data.description,
             status=project_data.status,
@@ -64,7 +65,7 @@ async def create_project_route(
         project_id = str(project["_id"])
 
         # Create notifications for newly added team members
-        create_notifications(
+        await create_notifications(
             post_id=None,  # No post related to project creation
             content=None,  # No content related to the project creation
             author_username=current_user.username,
@@ -91,7 +92,7 @@ async def get_projects_route(
     
     try:
         # Fetch all projects from the database
-        projects = list(projects_collections.find())
+        projects = await projects_collections.find().to_list(length=None)
 
         # Convert each project to the Project model
         response_projects = [ProjectResponse.from_mongo(project) for project in projects]
@@ -115,7 +116,7 @@ async def get_project_route(
     
     try:
         # Fetch the project from MongoDB using the provided project_id
-        project = projects_collections.find_one({"_id": ObjectId(project_id)})
+        project = await projects_collections.find_one({"_id": ObjectId(project_id)})
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
 
@@ -146,7 +147,7 @@ async def get_project_count_route(
         print("Attempting to count total projects...")
         
         # Count the documents in the collection
-        total_project_count = projects_collections.count_documents({})
+        total_project_count = await projects_collections.count_documents({})
 
         print(f"Total project count: {total_project_count}")
 
@@ -3,12 +3,14 @@ from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict, List
 from api.models.auth import oauth2_scheme, get_current_user
 from api.models.graph_database import get_graph
+from api.services.executors import db_executor
+from api.routes import LoadSheddingRoute
 from pydantic import BaseModel
 
 class RelationOption(BaseModel):
     option: str
 
-router = APIRouter()
+router = APIRouter(route_class=LoadSheddingRoute)
 
 @router.get("/get-graph")
 async def get_relation_graph(relation_option: str, token: str = Depends(oauth2_scheme)):
@@ -17,7 +19,7 @@ async def get_relation_graph(relation_option: str, token: str = Depends(oauth2_s
         raise HTTPException(status_code=400, detail="Inactive user")
     
     # Fetch the relationship graph based on the provided option
-    graph = get_graph(relation_option)
+    graph = await db_executor.run(get_graph, relation_option)
     if graph is None:
         raise HTTPException(status_code=404, detail="Relation not found or no data available.")
     
@@ -1,18 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from datetime import datetime
 from api.models.auth import get_current_user
-from agents.research import research_graph_builder
 from api.services.save_report import save_report  
 from api.models.get_database_collection import get_collections
 from api.models.auth import oauth2_scheme
+from api.services.checkpointer import setup_checkpointer
+from api.services.chain_registry import chain_registry
+from api.services.executors import llm_executor
+from agents.limits import GRAPH_MAX_CONCURRENCY
+from api.services.graph_registry import graph_registry
+from api.services.report_sessions import report_sessions, run_session_sweeper
+from api.services.report_jobs import report_jobs, FINISHED_STATUSES
+from api.routes import LoadSheddingRoute
+import asyncio
+import json
 import uuid  
 
-router = APIRouter()
+router = APIRouter(route_class=LoadSheddingRoute)
 
 report_collection = get_collections().get("report")
 
-# A simple in-memory store (in practice, consider using Redis or a database)
-sessions = {}
+session_sweeper = None
+
+# Seconds between job document reads while streaming events
+REPORT_JOB_POLL_SECONDS = 1.0
+
+async def release_session(job):
+    # A job whose worker stopped never finishes: let the user resubmit feedback
+    await report_sessions.update(job["thread_id"], status="awaiting_feedback")
+
+@router.on_event("startup")
+async def start_report_workers():
+    global session_sweeper
+    # Async checkpointers bind to the running loop, so they are opened here
+    await setup_checkpointer()
+    # Compile the report graphs before the first request needs them
+    graph_registry.warm()
+    # Interviews search our documents through the chatbot's retriever
+    await llm_executor.run(chain_registry.warm)
+    await report_sessions.ensure_indexes()
+    session_sweeper = asyncio.create_task(run_session_sweeper())
+    await report_jobs.start(on_abandoned=release_session)
+
+@router.on_event("shutdown")
+async def stop_report_workers():
+    if session_sweeper:
+        session_sweeper.cancel()
+    await report_jobs.stop()
+
+def thread_config(thread_id):
+    # Interviews fan out in parallel, bounded per run; providers are bounded per process
+    return {"configurable": {"thread_id": thread_id}, "max_concurrency": GRAPH_MAX_CONCURRENCY}
+
+async def collect_analysts(graph, graph_input, thread):
+    """ Run the graph until its next interruption and collect the analysts """
+    analysts_info = []
+    async for event in graph.astream(graph_input, thread, stream_mode="values"):
+        analysts = event.get('analysts', [])
+        for analyst in analysts:
+            analysts_info.append({
+                "name": analyst.name,
+                "affiliation": analyst.affiliation,
+                "role": analyst.role,
+                "description": analyst.description
+            })
+    return analysts_info
+
+async def start_report(topic, max_analysts, thread):
+    # Run the shared graph (without feedback); its state is checkpointed per thread
+    graph = graph_registry.research
+    return await collect_analysts(graph, {"topic": topic, "max_analysts": max_analysts}, thread)
+
+async def finish_report(thread, feedback, topic, max_analysts, on_update=None):
+    # Any worker can pick the thread up from the shared checkpointer
+    graph = graph_registry.research
+
+    # Add the feedback to the graph
+    await graph.aupdate_state(thread, {"human_analyst_feedback": feedback}, as_node="human_feedback")
+
+    # Generate the final report with the feedback applied
+    final_analysts_info = await collect_analysts(graph, {"topic": topic, "max_analysts": max_analysts}, thread)
+
+    # After updating the feedback, clear it to ensure no persistent feedback remains
+    await graph.aupdate_state(thread, {"human_analyst_feedback": None}, as_node="human_feedback")
+
+    # Stream updates, reporting each completed node, and get the final report state
+    async for event in graph.astream(None, thread, stream_mode="updates"):
+        node = next(iter(event.keys()))
+        if on_update:
+            await on_update({"node": node})
+
+    final_state = await graph.aget_state(thread)
+    return final_analysts_info, final_state.values
 
 @router.get("/generate-report")
 async def generate_report(
@@ -26,31 +106,13 @@ async def generate_report(
         raise HTTPException(status_code=400, detail="Inactive user")
     
     # Prepare the thread to collect the graph
-    thread = {"configurable": {"thread_id": str(uuid.uuid4())}}  
+    thread = thread_config(str(uuid.uuid4()))
 
-    # Generate the initial graph (without feedback)
-    graph = research_graph_builder()
-    analysts_info = []
+    # Run the graph to the feedback interruption and collect the analyst information
+    analysts_info = await start_report(topic, max_analysts, thread)
 
-    # Collect the analyst information
-    for event in graph.stream({"topic": topic, "max_analysts": max_analysts}, thread, stream_mode="values"):
-        analysts = event.get('analysts', [])
-        for analyst in analysts:
-            analysts_info.append({
-                "name": analyst.name,
-                "affiliation": analyst.affiliation,
-                "role": analyst.role,
-                "description": analyst.description
-            })
-
-    # Save the session (analysts_info + graph) in memory or database
-    sessions[thread["configurable"]["thread_id"]] = {
-        "analysts_info": analysts_info,
-        "topic": topic,
-        "max_analysts": max_analysts,
-        "graph": graph,  # Save the graph object here
-        "created_at": datetime.utcnow()
-    }
+    # Save the session; the graph state itself is already in the checkpointer
+    await report_sessions.create(thread["configurable"]["thread_id"], topic, max_analysts, analysts_info, current_user.username)
 
     # Return the thread ID for the next step (feedback)
     return {
@@ -59,7 +121,42 @@ async def generate_report(
         "message": "Please provide feedback to proceed with the final report generation."
     }
 
-@router.post("/submit-feedback")
+async def run_report_job(job_id, thread_id, feedback, topic, max_analysts):
+    """ Run a claimed report thread to completion, recording node progress on the job """
+    try:
+        final_analysts_info, final_values = await finish_report(
+            thread_config(thread_id), feedback, topic, max_analysts,
+            on_update=lambda event: report_jobs.record_event(job_id, event)
+        )
+    except Exception:
+        # Let the user retry from the last checkpoint
+        await report_sessions.update(thread_id, status="awaiting_feedback")
+        raise
+
+    report = final_values.get('final_report')
+    token_usage = {
+        "synthesis": final_values.get('synthesis_tokens'),
+        "nodes": final_values.get('token_usage'),
+    }
+
+    # Save the generated report to the database
+    await save_report(report_collection, {
+        "topic": topic,
+        "analysts": final_analysts_info,
+        "report": report,
+        "token_usage": token_usage,
+        "created_at": datetime.utcnow()  
+    })
+
+    # Remove the session and its checkpoints once the report is saved
+    await report_sessions.delete(thread_id)
+    return {"analysts": final_analysts_info, "report": report, "token_usage": token_usage}
+
+def format_job(job):
+    job["job_id"] = job.pop("_id")
+    return job
+
+@router.post("/submit-feedback", status_code=202)
 async def submit_feedback(
     thread_id: str,  
     feedback: str,
@@ -70,69 +167,81 @@ async def submit_feedback(
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
     
-    # Retrieve the session (analysts' information + graph) based on thread_id
-    session = sessions.get(thread_id)
+    # Claim the session so a concurrent request (on any worker) cannot run the same thread
+    session = await report_sessions.claim(thread_id, current_user.username, status="queued")
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    analysts_info = session["analysts_info"]
     topic = session["topic"]
     max_analysts = session["max_analysts"]
-    graph = session["graph"]  # Retrieve the graph object
 
-    thread = {"configurable": {"thread_id": thread_id}}
-    
-    # Add the feedback to the graph
-    graph.update_state(thread, {"human_analyst_feedback": feedback}, as_node="human_feedback")
-    
-    # Generate the final report with the feedback applied
-    final_analysts_info = []
-    for event in graph.stream({"topic": topic, "max_analysts": max_analysts}, thread, stream_mode="values"):
-        analysts = event.get('analysts', [])
-        for analyst in analysts:
-            final_analysts_info.append({
-                "name": analyst.name,
-                "affiliation": analyst.affiliation,
-                "role": analyst.role,
-                "description": analyst.description
-            })
-
-    # After updating the feedback, clear it to ensure no persistent feedback remains
-    graph.update_state(thread, {"human_analyst_feedback": None}, as_node="human_feedback")
-    
-    # Stream updates and get the final report state
-    for event in graph.stream(None, thread, stream_mode="updates"):
-        next(iter(event.keys()))  
-
-    final_state = graph.get_state(thread)
-    report = final_state.values.get('final_report')
-
-    # Prepare the final report data
-    report_data = {
-        "topic": topic,
-        "analysts": final_analysts_info,
-        "report": report,
-        "created_at": datetime.utcnow()  
-    }
-
-    # Save the generated report to the database
-    save_report(report_collection, report_data)
-
-    # Remove the session after the report is generated (optional)
-    del sessions[thread_id]
+    # The research graph runs for minutes, so it goes to the job queue
+    try:
+        job_id = await report_jobs.submit(
+            lambda job_id: run_report_job(job_id, thread_id, feedback, topic, max_analysts),
+            thread_id=thread_id,
+            topic=topic,
+            username=current_user.username,
+        )
+    except asyncio.QueueFull:
+        await report_sessions.update(thread_id, status="awaiting_feedback")
+        raise HTTPException(status_code=503, detail="Too many reports in progress, try again later", headers={"Retry-After": "60"})
 
     return {
-        "analysts": final_analysts_info,
-        "report": report
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/reports/jobs/{job_id}",
+        "events_url": f"/reports/jobs/{job_id}/events"
     }
 
+async def get_owned_job(job_id: str, token: str) -> dict:
+    claims = await get_current_user(token, oauth2_scheme, claims_only=True)
+    job = await report_jobs.get(job_id)
+    # Another user's job is reported exactly like a missing one
+    if not job or job.get("username") != claims.username:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/reports/jobs/{job_id}")
+async def get_report_job(job_id: str, token: str = Depends(oauth2_scheme)):
+    return format_job(await get_owned_job(job_id, token))
+
+@router.get("/reports/jobs/{job_id}/events")
+async def stream_report_job(request: Request, job_id: str, token: str = Depends(oauth2_scheme)):
+    await get_owned_job(job_id, token)
+
+    async def events():
+        sent = 0
+        while not await request.is_disconnected():
+            job = await report_jobs.get(job_id)
+            if job is None:
+                # The job document expired while the client was still listening
+                data = {"status": "failed", "report": None, "error": "Job not found"}
+                yield f"event: done\ndata: {json.dumps(data)}\n\n"
+                break
+            # Job documents are updated by whichever worker runs the job, so poll them
+            for event in job["events"][sent:]:
+                yield f"event: node\ndata: {json.dumps(event)}\n\n"
+            sent = len(job["events"])
+            if job["status"] in FINISHED_STATUSES:
+                data = {"status": job["status"], "report": job.get("report"), "error": job.get("error")}
+                yield f"event: done\ndata: {json.dumps(data)}\n\n"
+                break
+            await asyncio.sleep(REPORT_JOB_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/get-reports")
 async def get_reports(token: str = Depends(oauth2_scheme)):
     current_user = await get_current_user(token, oauth2_scheme)
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
 
-    reports = list(report_collection.find({}))
+    reports = await report_collection.find({}).to_list(length=None)
 
     formatted_reports = []
     for report in reports:
@@ -0,0 +1,131 @@
+# api/services/chain_registry.py
+import os
+import threading
+from typing import Callable, Dict
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.runnables import RunnablePassthrough
+from langchain_core.output_parsers import StrOutputParser
+from langchain.prompts import PromptTemplate
+from api.models.get_database_collection import get_sync_collections
+from api.models.retriever import get_embedding_model, get_vector_store, EMBEDDING_MODEL, RETRIEVER_K, RETRIEVER_BACKEND, RETRIEVER_HYBRID
+from api.models.lexical_index import BM25Index, LEXICAL_INDEX_PATH
+from api.models.hybrid_retriever import HybridRetriever
+from api.services.embedding_cache import cached_embeddings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gemini-1.5-pro")
+CHAT_TEMPERATURE = float(os.getenv("CHAT_TEMPERATURE", 0.2))
+
+question_template = """
+    Task: Answer the question using only the provided context: {context}.
+    Context: The documents consist of reports, policies, and publications related to Climate Change and Gender Inequality.
+    Instructions:
+        Provide accurate, detailed answers strictly based on the given documents.
+        Cite relevant references on the relationship between gender and climate change.
+        Do not introduce information beyond the documents or make assumptions.
+        If the query is unclear or lacks sufficient detail, ask for clarification before responding.
+        Maintain a neutral tone in your answer.
+        Avoid starting with phrases like "The provided text..."
+    Question: {question}
+    """
+
+
+class ChainRegistry:
+    """
+    Builds the chatbot's LLM client, embeddings, vector store and RAG chain
+    once per process. Components are created on first access (or by
+    `warm()` at startup) and shared by all requests; LangChain runnables
+    are safe to invoke concurrently.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, object] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _lock_for(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _get(self, name: str, build: Callable[[], object]):
+        component = self._components.get(name)
+        if component is None:
+            # One lock per component: builders read other components, which take their own locks
+            with self._lock_for(name):
+                component = self._components.get(name)
+                if component is None:
+                    component = build()
+                    self._components[name] = component
+        return component
+
+    @property
+    def llm(self):
+        return self._get("llm", lambda: ChatGoogleGenerativeAI(model=CHAT_MODEL, temperature=CHAT_TEMPERATURE, api_key=GOOGLE_API_KEY))
+
+    @property
+    def embeddings(self):
+        # Shared by query embedding and ingestion, so neither pays twice for the same text
+        return self._get("embeddings", lambda: cached_embeddings(get_embedding_model(), EMBEDDING_MODEL))
+
+    @property
+    def vector_store(self):
+        def build():
+            # The local backend reads its own index files and needs no Mongo connection
+            collection = get_sync_collections().get('embeddings') if RETRIEVER_BACKEND == 'atlas' else None
+            return get_vector_store(collection, self.embeddings, RETRIEVER_BACKEND)
+        return self._get("vector_store", build)
+
+    @property
+    def lexical_index(self):
+        return self._get("lexical_index", lambda: BM25Index.load(LEXICAL_INDEX_PATH))
+
+    @property
+    def retriever(self):
+        if RETRIEVER_HYBRID:
+            return self._get("retriever", lambda: HybridRetriever(vector_store=self.vector_store, lexical_index=self.lexical_index, k=RETRIEVER_K))
+        return self._get("retriever", lambda: self.vector_store.as_retriever(search_type='similarity', search_kwargs={'k': RETRIEVER_K}))
+
+    def retrieve(self, query: str, embedding) -> list:
+        """
+        Retrieve context for a query whose embedding is already computed.
+        """
+        if RETRIEVER_HYBRID:
+            return self.retriever.search(query, embedding)
+        return self.vector_store.similarity_search_by_vector(embedding, k=RETRIEVER_K)
+
+    @property
+    def prompt(self):
+        return self._get("prompt", lambda: PromptTemplate(input_variables=["context", "question"], template=question_template))
+
+    @property
+    def answer_chain(self):
+        # Generation only, for callers that retrieve the context themselves
+        return self._get("answer_chain", lambda: self.prompt | self.llm | StrOutputParser())
+
+    @property
+    def rag_chain(self):
+        return self._get("rag_chain", lambda: (
+            {
+                "context": self.retriever,
+                "question": RunnablePassthrough()
+            }
+            | self.prompt
+            | self.llm
+            | StrOutputParser()
+        ))
+
+    def warm(self):
+        # Build every component up front so the first request pays nothing
+        self.rag_chain
+        self.answer_chain
+
+    def reset(self):
+        with self._lock:
+            self._components.clear()
+
+
+# Shared registry for the process
+chain_registry = ChainRegistry()
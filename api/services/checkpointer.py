@@ -0,0 +1,78 @@
+# api/services/checkpointer.py
+import os
+import logging
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "sqlite" for a single host, "mongo" when several hosts share report threads
+LANGGRAPH_CHECKPOINTER = os.getenv("LANGGRAPH_CHECKPOINTER", "sqlite")
+LANGGRAPH_SQLITE_PATH = os.getenv("LANGGRAPH_SQLITE_PATH", "cache/langgraph_checkpoints.sqlite")
+
+_checkpointer = None
+
+def build_checkpointer(backend: str = LANGGRAPH_CHECKPOINTER) -> BaseCheckpointSaver:
+    """
+    Report graph nodes are async, so the savers are the async variants.
+    Must be called from the running event loop.
+    """
+    if backend == "sqlite":
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        os.makedirs(os.path.dirname(LANGGRAPH_SQLITE_PATH) or ".", exist_ok=True)
+        # The connection is opened by the saver's setup() on first use
+        return AsyncSqliteSaver(aiosqlite.connect(LANGGRAPH_SQLITE_PATH))
+    if backend == "mongo":
+        from langgraph.checkpoint.mongodb.aio import AsyncMongoDBSaver
+        from api.models.database import mongo_client
+        mongo_client.connect()
+        return AsyncMongoDBSaver(mongo_client.client, db_name=mongo_client.db.name)
+    if backend == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver()
+    raise ValueError(f"Unknown LangGraph checkpointer: {backend}")
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """
+    The process-wide checkpointer for report graphs. Any worker connected to
+    the same store can resume any thread.
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        _checkpointer = build_checkpointer()
+    return _checkpointer
+
+async def setup_checkpointer():
+    checkpointer = get_checkpointer()
+    if hasattr(checkpointer, "setup"):
+        await checkpointer.setup()
+        if type(checkpointer).__name__ == "AsyncSqliteSaver":
+            # Several uvicorn workers on one host share the file
+            await checkpointer.conn.execute("PRAGMA journal_mode=WAL")
+
+async def delete_thread(thread_id: str, checkpointer: BaseCheckpointSaver = None):
+    """
+    Remove every checkpoint and pending write stored for a thread.
+    """
+    checkpointer = checkpointer or get_checkpointer()
+    if hasattr(checkpointer, "adelete_thread"):
+        await checkpointer.adelete_thread(thread_id)
+        return
+
+    name = type(checkpointer).__name__
+    if name == "AsyncSqliteSaver":
+        await checkpointer.setup()
+        async with checkpointer.lock:
+            await checkpointer.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            await checkpointer.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            await checkpointer.conn.commit()
+    elif name == "AsyncMongoDBSaver":
+        await checkpointer.checkpoint_collection.delete_many({"thread_id": thread_id})
+        await checkpointer.writes_collection.delete_many({"thread_id": thread_id})
+    elif name == "MemorySaver":
+        checkpointer.storage.pop(thread_id, None)
+        for key in [key for key in checkpointer.writes if key[0] == thread_id]:
+            del checkpointer.writes[key]
+    else:
+        logging.error(f"Cannot delete threads from a {name} checkpointer")
@@ -0,0 +1,193 @@
+# api/services/climate_forecast.py
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import joblib
+import pandas as pd
+from sklearn.preprocessing import QuantileTransformer
+from api.services.climate_store import SeriesKey
+from api.services.executors import http_executor
+from api.services.load_climate_data import (
+    get_climate_data,
+    DEFAULT_LATITUDE,
+    DEFAULT_LONGITUDE,
+    DEFAULT_PARAMETERS,
+    DEFAULT_SCENARIO,
+)
+
+FORECAST_CACHE_DIR = os.getenv("FORECAST_CACHE_DIR", "cache/forecasts")
+FORECAST_REFRESH_SECONDS = int(os.getenv("FORECAST_REFRESH_SECONDS", 60 * 60))
+FORECAST_HORIZON_DAYS = 10
+
+model_temp = joblib.load('models/xgboost_temp_model.pkl')
+model_precip = joblib.load('models/xgboost_precip_model.pkl')
+
+def series_version(climate_change_df: pd.DataFrame) -> str:
+    """
+    Fingerprint of the observations the forecast depends on. The lag and
+    rolling features read only the last days, but the precipitation
+    transform is fit on the whole history, so every row is hashed.
+    """
+    observed = climate_change_df[['Temperature', 'Precipitation']]
+    digest = hashlib.sha1(pd.util.hash_pandas_object(observed).values.tobytes())
+    digest.update(str(climate_change_df.index[-1]).encode("utf-8"))
+    return digest.hexdigest()
+
+def build_future_features(climate_change_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Feature rows for the next 10 days, derived from the last observed day.
+    """
+    # Generate dates for the next 10 days
+    last_date = climate_change_df.index[-1]
+    future_dates = [last_date + timedelta(days=i) for i in range(1, FORECAST_HORIZON_DAYS + 1)]
+
+    future_df = pd.DataFrame(index=future_dates)
+    future_df['month'] = future_df.index.month
+    future_df['dayofyear'] = future_df.index.dayofyear
+    future_df['dayofmonth'] = future_df.index.day
+    future_df['dayofweek'] = future_df.index.dayofweek
+
+    # Add lag features
+    for lag in range(1, 4):
+        future_df[f'temp_lag_{lag}'] = climate_change_df['Temperature'].shift(lag).iloc[-1]
+        future_df[f'precip_lag_{lag}'] = climate_change_df['Precipitation'].shift(lag).iloc[-1]
+
+    future_df['temp_roll_mean'] = climate_change_df['Temperature'].rolling(window=7).mean().iloc[-1]
+    future_df['precip_roll_mean'] = climate_change_df['Precipitation'].rolling(window=7).mean().iloc[-1]
+    future_df['precip_diff'] = climate_change_df['Precipitation'].diff().iloc[-1]
+    future_df['precip_pct_change'] = climate_change_df['Precipitation'].pct_change().iloc[-1]
+
+    feature_names = model_temp.get_booster().feature_names
+    return future_df[feature_names]
+
+def fit_precipitation_transform(climate_change_df: pd.DataFrame) -> QuantileTransformer:
+    # The precipitation model predicts in the quantile-normalized space of each series
+    qt = QuantileTransformer(output_distribution='normal')
+    qt.fit(climate_change_df[['Precipitation']])
+    return qt
+
+def format_predictions(future_df: pd.DataFrame, temp_predictions, precip_predictions, qt: QuantileTransformer):
+    precip_predictions = qt.inverse_transform(precip_predictions.reshape(-1, 1)).flatten()
+
+    # Prepare final output
+    future_predictions_df = pd.DataFrame({
+        'Date': future_df.index,
+        'Predicted_Temperature': temp_predictions,
+        'Predicted_Precipitation': precip_predictions
+    })
+
+    future_predictions_df['Date'] = future_predictions_df['Date'].dt.strftime('%Y-%m-%d')
+    return future_predictions_df.to_dict(orient="records")
+
+def compute_forecast(climate_change_df: pd.DataFrame):
+    qt = fit_precipitation_transform(climate_change_df)
+    future_df = build_future_features(climate_change_df)
+
+    # Make predictions
+    future_temp_predictions = model_temp.predict(future_df)
+    future_precip_predictions = model_precip.predict(future_df)
+    return format_predictions(future_df, future_temp_predictions, future_precip_predictions, qt)
+
+def compute_batch_forecast(climate_frames: List[pd.DataFrame]) -> List[list]:
+    """
+    Forecast several locations with a single predict call per model by
+    stacking their feature rows into one matrix.
+    """
+    if not climate_frames:
+        return []
+
+    transforms = [fit_precipitation_transform(frame) for frame in climate_frames]
+    feature_frames = [build_future_features(frame) for frame in climate_frames]
+    stacked = pd.concat(feature_frames)
+
+    temp_predictions = model_temp.predict(stacked)
+    precip_predictions = model_precip.predict(stacked)
+
+    # Split the stacked predictions back into per-location slices
+    results = []
+    offset = 0
+    for future_df, qt in zip(feature_frames, transforms):
+        rows = slice(offset, offset + len(future_df))
+        results.append(format_predictions(future_df, temp_predictions[rows], precip_predictions[rows], qt))
+        offset += len(future_df)
+    return results
+
+
+class ForecastStore:
+    """
+    Latest materialized forecast per climate series, kept in memory and on
+    disk. Each entry carries the version of the series it was computed from.
+    """
+
+    def __init__(self, cache_dir: str = FORECAST_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._entries: Dict[SeriesKey, dict] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: SeriesKey) -> str:
+        return os.path.join(self.cache_dir, key.file_name().replace(".parquet", ".json"))
+
+    def get(self, key: SeriesKey) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key)) as f:
+                    entry = json.load(f)
+                self._entries[key] = entry
+            except Exception as e:
+                logging.error(f"Error reading stored forecast: {e}")
+        return entry
+
+    def put(self, key: SeriesKey, version: str, data: list) -> dict:
+        entry = {
+            "version": version,
+            "generated_at": datetime.utcnow().replace(microsecond=0).isoformat(),
+            "data": data,
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(key))
+        self._entries[key] = entry
+        return entry
+
+    def materialize(self, latitude: float = DEFAULT_LATITUDE, longitude: float = DEFAULT_LONGITUDE,
+                    parameters=DEFAULT_PARAMETERS, scenario: str = DEFAULT_SCENARIO) -> dict:
+        """
+        Recompute the forecast only when the underlying series has changed.
+        """
+        key = SeriesKey(latitude, longitude, tuple(parameters), scenario)
+        climate_change_df = get_climate_data(latitude, longitude, parameters, scenario)
+        version = series_version(climate_change_df)
+
+        with self._lock:
+            entry = self.get(key)
+            if entry and entry["version"] == version:
+                return entry
+            return self.put(key, version, compute_forecast(climate_change_df))
+
+    def latest(self, latitude: float = DEFAULT_LATITUDE, longitude: float = DEFAULT_LONGITUDE,
+               parameters=DEFAULT_PARAMETERS, scenario: str = DEFAULT_SCENARIO) -> dict:
+        entry = self.get(SeriesKey(latitude, longitude, tuple(parameters), scenario))
+        return entry or self.materialize(latitude, longitude, parameters, scenario)
+
+
+# Shared store for the process
+forecast_store = ForecastStore()
+
+async def run_forecast_scheduler(interval: int = FORECAST_REFRESH_SECONDS):
+    """
+    Periodically refresh the default forecast so requests never run inference.
+    """
+    while True:
+        try:
+            await http_executor.run(forecast_store.materialize)
+        except Exception as e:
+            logging.error(f"Error materializing climate forecast: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,121 @@
+# api/services/climate_store.py
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Tuple, NamedTuple
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CLIMATE_CACHE_DIR = os.getenv("CLIMATE_CACHE_DIR", "cache/climate")
+CLIMATE_CACHE_TTL_SECONDS = int(os.getenv("CLIMATE_CACHE_TTL_SECONDS", 6 * 60 * 60))
+
+
+class SeriesKey(NamedTuple):
+    latitude: float
+    longitude: float
+    parameters: Tuple[str, ...]
+    scenario: str
+
+    def file_name(self) -> str:
+        raw = f"{self.latitude:.4f}|{self.longitude:.4f}|{','.join(self.parameters)}|{self.scenario}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest() + ".parquet"
+
+
+class ClimateSeriesStore:
+    """
+    Daily climate series keyed by (lat, lon, parameters, scenario).
+
+    Series are held in memory and mirrored to Parquet files so a restarted
+    worker warm-starts from disk. A series older than the TTL is refreshed
+    by fetching only the days after its last observation.
+    """
+
+    def __init__(self, cache_dir: str = CLIMATE_CACHE_DIR, ttl_seconds: int = CLIMATE_CACHE_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self._frames: Dict[SeriesKey, Tuple[pd.DataFrame, float]] = {}
+        self._locks: Dict[SeriesKey, threading.Lock] = {}
+        self._async_locks: Dict[SeriesKey, asyncio.Lock] = {}
+        self._guard = threading.Lock()
+
+    def lock_for(self, key: SeriesKey) -> threading.Lock:
+        # One lock per series so concurrent misses trigger a single upstream fetch
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def async_lock_for(self, key: SeriesKey) -> asyncio.Lock:
+        # The event-loop counterpart of lock_for, for the async fetch path
+        with self._guard:
+            return self._async_locks.setdefault(key, asyncio.Lock())
+
+    def _path(self, key: SeriesKey) -> str:
+        return os.path.join(self.cache_dir, key.file_name())
+
+    def _load_from_disk(self, key: SeriesKey) -> Optional[Tuple[pd.DataFrame, float]]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            frame = pd.read_parquet(path)
+        except Exception as e:
+            logging.error(f"Error reading climate snapshot {path}: {e}")
+            return None
+        # The file modification time records when the series was last refreshed
+        entry = (frame, os.path.getmtime(path))
+        self._frames[key] = entry
+        return entry
+
+    def get(self, key: SeriesKey) -> Optional[pd.DataFrame]:
+        entry = self._frames.get(key) or self._load_from_disk(key)
+        return entry[0] if entry else None
+
+    def is_fresh(self, key: SeriesKey) -> bool:
+        entry = self._frames.get(key) or self._load_from_disk(key)
+        return entry is not None and time.time() - entry[1] < self.ttl_seconds
+
+    def last_date(self, key: SeriesKey) -> Optional[pd.Timestamp]:
+        frame = self.get(key)
+        if frame is None or frame.empty:
+            return None
+        return frame.index[-1]
+
+    def merge(self, key: SeriesKey, new_rows: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Append newly fetched days to the stored series and persist it.
+        """
+        frame = self.get(key)
+        path = self._path(key)
+
+        if frame is not None and (new_rows is None or new_rows.empty):
+            # Nothing new upstream, only mark the series as refreshed
+            if os.path.exists(path):
+                os.utime(path)
+            self._frames[key] = (frame, time.time())
+            return frame
+
+        if frame is None:
+            frame = new_rows
+        else:
+            frame = pd.concat([frame, new_rows])
+            # Keep the most recent value when the upstream revises a day
+            frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+
+        if frame is None:
+            raise ValueError("No climate data available for this series")
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        frame.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+        self._frames[key] = (frame, time.time())
+        return frame
+
+
+# Shared store for the process
+climate_store = ClimateSeriesStore()
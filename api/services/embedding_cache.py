@@ -0,0 +1,214 @@
+# api/services/embedding_cache.py
+import os
+import time
+import array
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from langchain_core.embeddings import Embeddings
+from api.services.cache import TTLCache
+from api.services.executors import db_executor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60))
+# Persistent tier: "mongo", "disk" (sqlite file) or "none"
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "mongo")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+def embedding_key(model: str, kind: str, text: str) -> str:
+    # Query and document embeddings use different task types, so they never share entries
+    return hashlib.sha256(f"{model}\0{kind}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class MongoEmbeddingStore:
+    """
+    Embeddings persisted in the `embedding_cache` collection, keyed by _id.
+    """
+
+    def __init__(self, collection=None):
+        self._collection = collection
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from api.models.get_database_collection import get_sync_collections
+            self._collection = get_sync_collections().get("embedding_cache")
+        return self._collection
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        return {doc["_id"]: doc["embedding"] for doc in self.collection.find({"_id": {"$in": keys}}, {"embedding": 1})}
+
+    def set_many(self, entries: Dict[str, List[float]], model: str):
+        now = time.time()
+        self.collection.bulk_write(
+            [
+                UpdateOne({"_id": key}, {"$setOnInsert": {"embedding": vector, "model": model, "created_at": now}}, upsert=True)
+                for key, vector in entries.items()
+            ],
+            ordered=False,
+        )
+
+
+class SqliteEmbeddingStore:
+    """
+    Embeddings persisted as float32 blobs in a local sqlite file.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)")
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connection.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys).fetchall()
+        return {key: array.array("f", blob).tolist() for key, blob in rows}
+
+    def set_many(self, entries: Dict[str, List[float]], model: str):
+        rows = [(key, model, array.array("f", vector).tobytes()) for key, vector in entries.items()]
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR IGNORE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+
+def get_embedding_store(backend: str = EMBEDDING_CACHE_BACKEND):
+    if backend == "mongo":
+        return MongoEmbeddingStore()
+    if backend == "disk":
+        return SqliteEmbeddingStore()
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown embedding cache backend: {backend}")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model with an in-memory LRU tier and an optional
+    persistent tier. Only texts missing from both tiers reach the model, and
+    a failing persistent tier degrades to memory-only caching.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, store=None,
+                 maxsize: int = EMBEDDING_CACHE_SIZE, ttl: float = EMBEDDING_CACHE_TTL_SECONDS):
+        self.embeddings = embeddings
+        self.model = model
+        self.store = store
+        self.memory = TTLCache(maxsize, ttl)
+
+        # Metrics
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def _from_memory(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is not None:
+                found[key] = vector
+        self.memory_hits += len(found)
+        return found
+
+    def _from_store(self, keys: List[str]) -> Dict[str, List[float]]:
+        if self.store is None or not keys:
+            return {}
+        try:
+            found = self.store.get_many(keys)
+        except (PyMongoError, sqlite3.Error) as e:
+            logging.error(f"Error reading the embedding cache: {e}")
+            return {}
+        for key, vector in found.items():
+            self.memory.set(key, vector)
+        self.store_hits += len(found)
+        return found
+
+    def _remember(self, entries: Dict[str, List[float]]):
+        for key, vector in entries.items():
+            self.memory.set(key, vector)
+        if self.store is None or not entries:
+            return
+        try:
+            self.store.set_many(entries, self.model)
+        except (PyMongoError, sqlite3.Error) as e:
+            logging.error(f"Error writing the embedding cache: {e}")
+
+    def _lookup(self, kind: str, texts: List[str]):
+        keys = [embedding_key(self.model, kind, text) for text in texts]
+        found = self._from_memory(keys)
+        found.update(self._from_store([key for key in set(keys) if key not in found]))
+        return keys, found
+
+    def _missing(self, keys: List[str], texts: List[str], found: Dict[str, List[float]]) -> Dict[str, str]:
+        # One model call per distinct missing text
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        self.misses += len(missing)
+        return missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found = self._lookup("document", texts)
+        missing = self._missing(keys, texts, found)
+        if missing:
+            computed = dict(zip(missing, self.embeddings.embed_documents(list(missing.values()))))
+            self._remember(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found = self._lookup("query", [text])
+        if keys[0] not in found:
+            self.misses += 1
+            found[keys[0]] = self.embeddings.embed_query(text)
+            self._remember({keys[0]: found[keys[0]]})
+        return found[keys[0]]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_key(self.model, "document", text) for text in texts]
+        found = self._from_memory(keys)
+        found.update(await db_executor.run(self._from_store, [key for key in set(keys) if key not in found]))
+        missing = self._missing(keys, texts, found)
+        if missing:
+            computed = dict(zip(missing, await self.embeddings.aembed_documents(list(missing.values()))))
+            await db_executor.run(self._remember, computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = embedding_key(self.model, "query", text)
+        vector = self._from_memory([key]).get(key)
+        if vector is None:
+            vector = (await db_executor.run(self._from_store, [key])).get(key)
+        if vector is None:
+            self.misses += 1
+            vector = await self.embeddings.aembed_query(text)
+            await db_executor.run(self._remember, {key: vector})
+        return vector
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.store_hits + self.misses
+        return {
+            "model": self.model,
+            "backend": type(self.store).__name__ if self.store else None,
+            "memory_entries": len(self.memory),
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.store_hits) / lookups if lookups else 0.0,
+        }
+
+
+def cached_embeddings(embeddings: Embeddings, model: str, backend: str = EMBEDDING_CACHE_BACKEND) -> CachedEmbeddings:
+    return CachedEmbeddings(embeddings, model, get_embedding_store(backend))
@@ -0,0 +1,179 @@
+# api/services/executors.py
+import os
+import time
+import atexit
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a bounded executor already has its maximum number of pending tasks."""
+
+
+class BoundedExecutor:
+    """
+    A thread or process pool for one class of blocking work.
+
+    At most `max_workers` tasks run at a time. Callers beyond that wait on a
+    semaphore, which makes queue depth and wait time measurable, and calls
+    are rejected once `max_pending` tasks are queued. A worker slot is held
+    until the task itself finishes, even if the awaiting caller is cancelled.
+    Semaphores are kept per event loop, since asyncio primitives cannot be
+    shared across loops (the agents start a new loop per stream).
+    """
+
+    def __init__(self, name: str, max_workers: int, process: bool = False, max_pending: Optional[int] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.process = process
+        self.max_pending = max_pending
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._metrics_lock = threading.Lock()
+
+        # Metrics
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    @property
+    def pool(self) -> Executor:
+        # Pools are created on first use so importing this module never forks
+        with self._pool_lock:
+            if self._pool is None:
+                if self.process:
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            return self._pool
+
+    def _semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_workers)
+        return semaphore
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        with self._metrics_lock:
+            if self.max_pending is not None and self.queued >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorSaturated(f"The {self.name} executor is saturated, try again later")
+            self.queued += 1
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore(loop)
+        submitted_at = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            with self._metrics_lock:
+                self.queued -= 1
+
+        waited = time.perf_counter() - submitted_at
+        started_at = time.perf_counter()
+        with self._metrics_lock:
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            self.active += 1
+
+        try:
+            future = self.pool.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._finish(None, started_at)
+            semaphore.release()
+            raise
+
+        def on_done(done):
+            # Metrics are settled here, so they stay right even if the caller's loop is gone
+            self._finish(done, started_at)
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                # The event loop closed before the task finished; its semaphore went with it
+                pass
+
+        future.add_done_callback(on_done)
+        # Cancelling the caller cancels a task that has not started; a running one keeps its slot until it returns
+        return await asyncio.wrap_future(future)
+
+    def _finish(self, future, started_at: float):
+        with self._metrics_lock:
+            if future is None or future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self.active -= 1
+            self.run_seconds_total += time.perf_counter() - started_at
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "kind": "process" if self.process else "thread",
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "queue_depth": self.queued,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_seconds_avg": self.wait_seconds_total / finished if finished else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+            "run_seconds_avg": self.run_seconds_total / finished if finished else 0.0,
+        }
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def pending_limit(name: str, max_workers: int) -> int:
+    # Calls beyond this many queued tasks are rejected rather than piling up behind the workers
+    return int(os.getenv(f"EXECUTOR_{name.upper()}_MAX_PENDING", max_workers * 8))
+
+def bounded_executor(name: str, default_workers: int, process: bool = False) -> BoundedExecutor:
+    max_workers = int(os.getenv(f"EXECUTOR_{name.upper()}_WORKERS", default_workers))
+    return BoundedExecutor(name, max_workers, process=process, max_pending=pending_limit(name, max_workers))
+
+
+# One executor per workload class
+db_executor = bounded_executor("db", 32)
+http_executor = bounded_executor("http", 16)
+cpu_executor = bounded_executor("cpu", CPU_COUNT, process=True)
+llm_executor = bounded_executor("llm", 8)
+# Password hashing is CPU-heavy by design, so it gets a small pool that sheds load early
+auth_executor = BoundedExecutor(
+    "auth",
+    int(os.getenv("EXECUTOR_AUTH_WORKERS", min(4, CPU_COUNT))),
+    max_pending=int(os.getenv("EXECUTOR_AUTH_MAX_PENDING", 64)),
+)
+
+executors: Dict[str, BoundedExecutor] = {
+    executor.name: executor for executor in (db_executor, http_executor, cpu_executor, llm_executor, auth_executor)
+}
+
+def executor_stats() -> dict:
+    return {name: executor.stats() for name, executor in executors.items()}
+
+def shutdown_executors():
+    for executor in executors.values():
+        executor.shutdown()
+
+# Registered on the process rather than a router, so pools are shut down however the app is assembled
+atexit.register(shutdown_executors)
@@ -1,33 +1,199 @@
 # api/gii.py
+import os
+import json
+import glob
+import hashlib
+import logging
+import asyncio
+import threading
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import pandas as pd
 from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
+from api.services.gii_source import gii_source
+from api.services.executors import cpu_executor, db_executor
 
-gii_url = "https://data.humdata.org/dataset/5a1ea18e-9177-4e37-b91f-5631961bdb6c/resource/4539296c-289c-48a2-b0dc-3fc8dcad1b77/download/gii_gender_inequality_index_value.csv"
+GII_MODEL_DIR = os.getenv("GII_MODEL_DIR", "cache/gii_models")
+GII_FORECAST_PERIODS = 8
 
-def fetch_gii_data():
-    return pd.read_csv(gii_url)
+# Fitted models and their forecasts per country, keyed by the input series hash
+gii_models: Dict[str, dict] = {}
+gii_models_lock = threading.Lock()
 
-def forecast_gii(nepal_data):
-    nepal_data = nepal_data[nepal_data["country"] == "Nepal"]
-    nepal_data = nepal_data.groupby("year")["value"].mean()
+def fetch_gii_data(countries: Optional[List[str]] = None):
+    return gii_source.read(countries)
 
-    nepal_data_prophet = pd.DataFrame({
-        'ds': pd.to_datetime(nepal_data.index.astype(str)),  
-        'y': nepal_data.values  
+def to_prophet_frame(country_data: pd.DataFrame) -> pd.DataFrame:
+    country_data = country_data.groupby("year")["value"].mean()
+
+    return pd.DataFrame({
+        'ds': pd.to_datetime(country_data.index.astype(str)),
+        'y': country_data.values
     })
 
-    model = Prophet()
-    model.fit(nepal_data_prophet)
+def prepare_country_series(gii_data: pd.DataFrame, country: str) -> pd.DataFrame:
+    return to_prophet_frame(gii_data[gii_data["country"] == country])
+
+def split_countries(gii_data: pd.DataFrame, countries: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Group the dataset once into a Prophet-ready series per country.
+    Passing None or ["all"] selects every country in the dataset.
+    """
+    if countries and "all" not in countries:
+        gii_data = gii_data[gii_data["country"].isin(countries)]
+
+    return {country: to_prophet_frame(country_data) for country, country_data in gii_data.groupby("country", sort=True)}
 
-    future = model.make_future_dataframe(periods=8, freq="AS")  
+def series_hash(country_data_prophet: pd.DataFrame) -> str:
+    return hashlib.sha256(pd.util.hash_pandas_object(country_data_prophet, index=False).values.tobytes()).hexdigest()[:16]
+
+def model_path(country: str, data_hash: str) -> str:
+    safe_country = "".join(c if c.isalnum() else "_" for c in country)
+    return os.path.join(GII_MODEL_DIR, f"{safe_country}-{data_hash}.json")
+
+def build_forecast_records(model: Prophet, country_data_prophet: pd.DataFrame) -> list:
+    future = model.make_future_dataframe(periods=GII_FORECAST_PERIODS, freq="AS")
     forecast = model.predict(future)
 
-    actual_data = nepal_data_prophet.copy()
+    actual_data = country_data_prophet.copy()
     actual_data['type'] = 'Actual'
     forecast_data = forecast[['ds', 'yhat']].copy()
     forecast_data.rename(columns={'yhat': 'y'}, inplace=True)
     forecast_data['type'] = 'Forecast'
 
     combined_data = pd.concat([actual_data, forecast_data])
-    
+    combined_data['ds'] = combined_data['ds'].map(lambda ds: ds.isoformat())
+
     return combined_data.to_dict(orient='records')
+
+def fit_country_model(country_data_prophet: pd.DataFrame) -> Tuple[str, list]:
+    """
+    Fit one country's model. Runs in a worker process, so only
+    serializable values are returned.
+    """
+    model = Prophet()
+    model.fit(country_data_prophet)
+    return model_to_json(model), build_forecast_records(model, country_data_prophet)
+
+def save_model(country: str, data_hash: str, model_json: str, records: list):
+    os.makedirs(GII_MODEL_DIR, exist_ok=True)
+    path = model_path(country, data_hash)
+    with open(path + ".tmp", "w") as f:
+        json.dump({
+            "country": country,
+            "hash": data_hash,
+            "periods": GII_FORECAST_PERIODS,
+            "model": model_json,
+            "forecast": records,
+        }, f)
+    os.replace(path + ".tmp", path)
+
+    # Drop models fitted on older versions of this country's series
+    for old_path in glob.glob(model_path(country, "*")):
+        if old_path != path:
+            os.remove(old_path)
+
+def load_models():
+    """
+    Index serialized models at startup. Prophet models are only deserialized
+    when a forecast cannot be served from the stored result.
+    """
+    for path in glob.glob(os.path.join(GII_MODEL_DIR, "*.json")):
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+            with gii_models_lock:
+                gii_models[stored["country"]] = {
+                    "hash": stored["hash"],
+                    "model_json": stored["model"],
+                    "model": None,
+                    # A forecast stored for another horizon is recomputed from the fitted model
+                    "forecast": stored["forecast"] if stored.get("periods") == GII_FORECAST_PERIODS else None,
+                }
+        except Exception as e:
+            logging.error(f"Error loading GII model {path}: {e}")
+
+def get_model(country: str) -> Optional[Prophet]:
+    entry = gii_models.get(country)
+    if entry is None:
+        return None
+    if entry["model"] is None:
+        entry["model"] = model_from_json(entry["model_json"])
+    return entry["model"]
+
+def cached_forecast(country: str, country_data_prophet: pd.DataFrame, data_hash: str) -> Optional[list]:
+    # Serve the stored forecast while the source series is unchanged
+    entry = gii_models.get(country)
+    if entry and entry["hash"] == data_hash:
+        if entry["forecast"] is None:
+            entry["forecast"] = build_forecast_records(get_model(country), country_data_prophet)
+        return entry["forecast"]
+    return None
+
+def store_fitted(country: str, data_hash: str, model_json: str, records: list):
+    save_model(country, data_hash, model_json, records)
+    with gii_models_lock:
+        gii_models[country] = {"hash": data_hash, "model_json": model_json, "model": None, "forecast": records}
+
+def forecast_gii(gii_data, country: str = "Nepal"):
+    country_data_prophet = prepare_country_series(gii_data, country)
+    data_hash = series_hash(country_data_prophet)
+
+    records = cached_forecast(country, country_data_prophet, data_hash)
+    if records is not None:
+        return records
+
+    # The source data changed (or was never seen): refit and persist
+    model_json, records = fit_country_model(country_data_prophet)
+    store_fitted(country, data_hash, model_json, records)
+    return records
+
+async def aforecast_gii(gii_data, country: str = "Nepal"):
+    """
+    Same as forecast_gii, but a refit runs in the CPU process pool.
+    """
+    country_data_prophet = prepare_country_series(gii_data, country)
+    data_hash = series_hash(country_data_prophet)
+
+    records = cached_forecast(country, country_data_prophet, data_hash)
+    if records is not None:
+        return records
+
+    model_json, records = await cpu_executor.run(fit_country_model, country_data_prophet)
+    await db_executor.run(store_fitted, country, data_hash, model_json, records)
+    return records
+
+async def stream_gii_forecasts(gii_data, countries: Optional[List[str]] = None) -> AsyncIterator[dict]:
+    """
+    Forecast several countries, fitting stale ones in the process pool and
+    yielding each country's result as soon as it is ready.
+    """
+    # Keep only as many fits in flight as the pool has workers, so a large request never overflows its queue
+    fit_slots = asyncio.Semaphore(cpu_executor.max_workers)
+
+    async def fit(country, country_data_prophet, data_hash):
+        try:
+            async with fit_slots:
+                model_json, records = await cpu_executor.run(fit_country_model, country_data_prophet)
+        except Exception as e:
+            return {"country": country, "error": str(e)}
+        await db_executor.run(store_fitted, country, data_hash, model_json, records)
+        return {"country": country, "data": records}
+
+    series = split_countries(gii_data, countries)
+    if countries and "all" not in countries:
+        for country in countries:
+            if country not in series:
+                yield {"country": country, "error": f"No GII data for {country}"}
+
+    pending = []
+    for country, country_data_prophet in series.items():
+        data_hash = series_hash(country_data_prophet)
+        records = cached_forecast(country, country_data_prophet, data_hash)
+        if records is not None:
+            yield {"country": country, "data": records}
+        else:
+            pending.append(fit(country, country_data_prophet, data_hash))
+
+    for next_result in asyncio.as_completed(pending):
+        yield await next_result
@@ -0,0 +1,177 @@
+# api/services/gii_source.py
+import io
+import os
+import json
+import time
+import logging
+import threading
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+import requests
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GII_URL = os.getenv(
+    "GII_URL",
+    "https://data.humdata.org/dataset/5a1ea18e-9177-4e37-b91f-5631961bdb6c/resource/4539296c-289c-48a2-b0dc-3fc8dcad1b77/download/gii_gender_inequality_index_value.csv",
+)
+GII_SNAPSHOT_DIR = os.getenv("GII_SNAPSHOT_DIR", "cache/gii")
+GII_REFRESH_SECONDS = int(os.getenv("GII_REFRESH_SECONDS", 24 * 60 * 60))
+GII_FETCH_TIMEOUT = float(os.getenv("GII_FETCH_TIMEOUT", 10))
+
+# Only the columns the forecasts use are kept in the snapshot
+GII_COLUMNS = ["country", "year", "value"]
+# Schema metadata key holding the per-country row ranges
+INDEX_METADATA_KEY = b"gii_country_index"
+
+
+class GIIDataSource:
+    """
+    Local snapshot of the HDX GII dataset.
+
+    The CSV is downloaded with conditional GET and converted once into an
+    Arrow file sorted by country, with a row-range index per country stored
+    in the file's schema metadata, so data and index are replaced together.
+    Reads memory-map the file and slice out only the requested countries. When the
+    upstream is slow or unavailable the last snapshot is served.
+    """
+
+    def __init__(self, url: str = GII_URL, snapshot_dir: str = GII_SNAPSHOT_DIR,
+                 refresh_seconds: int = GII_REFRESH_SECONDS, timeout: float = GII_FETCH_TIMEOUT):
+        self.url = url
+        self.snapshot_dir = snapshot_dir
+        self.refresh_seconds = refresh_seconds
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.snapshot_dir, "gii.arrow")
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.snapshot_dir, "gii.meta.json")
+
+    def _read_meta(self) -> dict:
+        if not os.path.exists(self.meta_path):
+            return {}
+        with open(self.meta_path) as f:
+            return json.load(f)
+
+    def _local_path(self) -> Optional[str]:
+        parsed = urlparse(self.url)
+        if parsed.scheme == "file":
+            return parsed.path
+        if parsed.scheme in ("", None) or os.path.exists(self.url):
+            return self.url
+        return None
+
+    def _download(self, meta: dict) -> Optional[bytes]:
+        """
+        Returns the CSV bytes, or None when the snapshot is still current.
+        """
+        local_path = self._local_path()
+        if local_path:
+            if meta.get("source_mtime") == os.path.getmtime(local_path):
+                return None
+            with open(local_path, "rb") as f:
+                meta["source_mtime"] = os.path.getmtime(local_path)
+                return f.read()
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = requests.get(self.url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+
+        meta["etag"] = response.headers.get("ETag")
+        meta["last_modified"] = response.headers.get("Last-Modified")
+        return response.content
+
+    def _write_snapshot(self, raw_csv: bytes, meta: dict):
+        data = pd.read_csv(io.BytesIO(raw_csv), usecols=GII_COLUMNS)
+        data["country"] = data["country"].astype(str)
+        data["year"] = pd.to_numeric(data["year"], errors="coerce").astype("Int16")
+        data["value"] = pd.to_numeric(data["value"], errors="coerce").astype("float32")
+        data = data.sort_values(["country", "year"], kind="stable").reset_index(drop=True)
+
+        # Row range of each country in the sorted file
+        index = {}
+        for country, rows in data.groupby("country", sort=False).indices.items():
+            index[country] = [int(rows[0]), int(len(rows))]
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        # The index travels inside the data file, so a reader never pairs it with another snapshot's rows
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            INDEX_METADATA_KEY: json.dumps(index).encode(),
+        })
+        with pa.OSFile(self.data_path + ".tmp", "wb") as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(self.data_path + ".tmp", self.data_path)
+
+        meta.pop("index", None)
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def refresh(self, force: bool = False):
+        """
+        Bring the snapshot up to date, at most once per refresh interval.
+        """
+        if not force and time.time() - self._checked_at < self.refresh_seconds and os.path.exists(self.data_path):
+            return
+
+        with self._lock:
+            if not force and time.time() - self._checked_at < self.refresh_seconds and os.path.exists(self.data_path):
+                return
+
+            meta = self._read_meta()
+            try:
+                raw_csv = self._download(meta)
+                if raw_csv is not None:
+                    self._write_snapshot(raw_csv, meta)
+            except Exception as e:
+                # Fall back to the last snapshot when the upstream is slow or down
+                if not os.path.exists(self.data_path):
+                    raise Exception(f"Failed to retrieve GII data and no local snapshot exists: {e}")
+                logging.error(f"Error refreshing GII data, serving last snapshot: {e}")
+            self._checked_at = time.time()
+
+    def read(self, countries: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        self.refresh()
+
+        with pa.memory_map(self.data_path, "r") as source:
+            table = ipc.open_file(source).read_all()
+
+            if countries is None:
+                return table.to_pandas()
+
+            index_json = (table.schema.metadata or {}).get(INDEX_METADATA_KEY)
+            if index_json is None:
+                # Snapshot written before the index moved into the file
+                data = table.to_pandas()
+                return data[data["country"].isin(list(countries))].reset_index(drop=True)
+            index = json.loads(index_json)
+
+            # Slice only the requested countries out of the mapped file
+            slices = [table.slice(*index[country]) for country in countries if country in index]
+            if not slices:
+                return table.schema.empty_table().to_pandas()
+            return pa.concat_tables(slices).to_pandas()
+
+
+# Shared data source for the process
+gii_source = GIIDataSource()
@@ -0,0 +1,43 @@
+# api/services/graph_registry.py
+import threading
+from typing import Callable, Dict
+from agents.research import research_graph_builder
+from api.services.checkpointer import get_checkpointer
+
+
+class GraphRegistry:
+    """
+    Compiles the LangGraph report graphs once per process. Compiled graphs
+    hold no per-run state: each request is isolated by the `thread_id` in
+    its config, and state lives in the shared checkpointer.
+    """
+
+    def __init__(self):
+        self._graphs: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, build: Callable[[], object]):
+        graph = self._graphs.get(name)
+        if graph is None:
+            with self._lock:
+                graph = self._graphs.get(name)
+                if graph is None:
+                    graph = build()
+                    self._graphs[name] = graph
+        return graph
+
+    @property
+    def research(self):
+        # Includes the interview subgraph, compiled along with it
+        return self._get("research", lambda: research_graph_builder(get_checkpointer()))
+
+    def warm(self):
+        self.research
+
+    def reset(self):
+        with self._lock:
+            self._graphs.clear()
+
+
+# Shared registry for the process
+graph_registry = GraphRegistry()
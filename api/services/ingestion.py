@@ -0,0 +1,293 @@
+# api/services/ingestion.py
+"""
+Batch ingestion of PDFs and text reports into the `embeddings` collection.
+
+    python -m api.services.ingestion path/to/reports [more/paths ...]
+
+Files are parsed page by page, split into chunks, deduplicated by content
+hash and embedded in batches. Embedding requests run concurrently under a
+request-rate limit, and each batch is written with an unordered
+insert_many; inserted chunks are also added to the BM25 index used by the
+hybrid retriever, and to the local vector index when RETRIEVER_BACKEND=local
+(Atlas indexes the collection itself). A checkpoint file records every
+fully ingested file (with its size and mtime), so an interrupted run
+resumes where it stopped and re-running on an unchanged corpus parses
+nothing.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional
+from pymongo.errors import BulkWriteError
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from api.models.get_database_collection import get_collections
+from api.models.local_index import iter_export
+from api.models.retriever import RETRIEVER_BACKEND
+from api.services.chain_registry import chain_registry
+from api.services.executors import cpu_executor, db_executor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", 1000))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", 150))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", 4))
+EMBED_REQUESTS_PER_MINUTE = int(os.getenv("EMBED_REQUESTS_PER_MINUTE", 120))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 5))
+INGEST_CHECKPOINT_FILE = os.getenv("INGEST_CHECKPOINT_FILE", "cache/ingest/checkpoint.json")
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+DUPLICATE_KEY_ERROR = 11000
+
+
+def content_hash(text: str) -> str:
+    # Whitespace and case differences do not make a chunk new
+    normalized = " ".join(text.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def iter_files(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            yield path
+
+def iter_pages(path: str) -> Iterator[Document]:
+    """
+    Yield one Document per PDF page (or one per text file) without holding
+    the whole file's text in memory.
+    """
+    source = os.path.basename(path)
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+        for page_number, page in enumerate(reader.pages, start=1):
+            text = page.extract_text() or ""
+            if text.strip():
+                yield Document(page_content=text, metadata={"source": source, "page": page_number})
+    else:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        if text.strip():
+            yield Document(page_content=text, metadata={"source": source, "page": None})
+
+def split_file(path: str, chunk_size: int = INGEST_CHUNK_SIZE, chunk_overlap: int = INGEST_CHUNK_OVERLAP) -> List[Document]:
+    """
+    Parse and split one file. CPU-bound, so the pipeline runs it on the cpu executor.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    for page in iter_pages(path):
+        chunks.extend(splitter.split_documents([page]))
+    return chunks
+
+
+class RateLimiter:
+    """
+    Spaces request starts at least `60 / requests_per_minute` seconds apart.
+    """
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Checkpoint:
+    """
+    JSON record of fully ingested files, keyed by path.
+    """
+
+    def __init__(self, path: str = INGEST_CHECKPOINT_FILE):
+        self.path = path
+        self.files: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.files = json.load(f)
+
+    @staticmethod
+    def fingerprint(path: str) -> dict:
+        stat = os.stat(path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def is_done(self, path: str) -> bool:
+        entry = self.files.get(os.path.abspath(path))
+        return entry is not None and {key: entry.get(key) for key in ("size", "mtime")} == self.fingerprint(path)
+
+    def mark_done(self, path: str, chunks: int):
+        self.files[os.path.abspath(path)] = {**self.fingerprint(path), "chunks": chunks, "ingested_at": time.time()}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.files, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class IngestionPipeline:
+    """
+    Chunk, deduplicate, embed and insert documents into the embeddings collection.
+    """
+
+    def __init__(self, collection=None, embeddings=None, lexical_index=None, vector_index=None,
+                 checkpoint: Optional[Checkpoint] = None,
+                 batch_size: int = EMBED_BATCH_SIZE, max_concurrency: int = EMBED_MAX_CONCURRENCY,
+                 requests_per_minute: int = EMBED_REQUESTS_PER_MINUTE):
+        self.collection = collection if collection is not None else get_collections().get('embeddings')
+        self.embeddings = embeddings or chain_registry.embeddings
+        self.lexical_index = lexical_index if lexical_index is not None else chain_registry.lexical_index
+        if vector_index is None and RETRIEVER_BACKEND == 'local':
+            vector_index = chain_registry.vector_store
+        self.vector_index = vector_index
+        self.checkpoint = checkpoint or Checkpoint()
+        self.batch_size = batch_size
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self._seen_hashes = set()
+        self._index_ready = False
+
+        # Progress of the current run
+        self.stats = {"files": 0, "files_skipped": 0, "chunks": 0, "duplicates": 0, "inserted": 0, "failed_files": 0}
+
+    async def ensure_index(self):
+        if not self._index_ready:
+            # Existing documents predate content_hash, so only index those that have one
+            await self.collection.create_index(
+                "content_hash", unique=True, partialFilterExpression={"content_hash": {"$exists": True}}
+            )
+            self._index_ready = True
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        async with self.semaphore:
+            for attempt in range(EMBED_MAX_RETRIES):
+                await self.rate_limiter.wait()
+                try:
+                    return await self.embeddings.aembed_documents(texts)
+                except Exception as e:
+                    if attempt == EMBED_MAX_RETRIES - 1:
+                        raise
+                    backoff = 2 ** attempt
+                    logging.error(f"Embedding batch failed ({e}), retrying in {backoff}s")
+                    await asyncio.sleep(backoff)
+
+    async def new_chunks(self, chunks: List[Document]) -> List[Document]:
+        """
+        Drop chunks already seen in this run or already stored in Mongo.
+        """
+        fresh = {}
+        for chunk in chunks:
+            chunk_hash = content_hash(chunk.page_content)
+            if chunk_hash not in self._seen_hashes and chunk_hash not in fresh:
+                chunk.metadata["content_hash"] = chunk_hash
+                fresh[chunk_hash] = chunk
+        self._seen_hashes.update(fresh)
+
+        if fresh:
+            cursor = self.collection.find({"content_hash": {"$in": list(fresh)}}, {"content_hash": 1})
+            async for stored in cursor:
+                fresh.pop(stored["content_hash"], None)
+
+        self.stats["duplicates"] += len(chunks) - len(fresh)
+        return list(fresh.values())
+
+    async def insert_batch(self, chunks: List[Document]):
+        vectors = await self.embed_batch([chunk.page_content for chunk in chunks])
+        records = [
+            {"text": chunk.page_content, "embedding": vector, **chunk.metadata}
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        try:
+            await self.collection.insert_many(records, ordered=False)
+        except BulkWriteError as e:
+            # A concurrent run may have inserted the same chunk first
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            rejected = {error["index"] for error in errors}
+            records = [record for i, record in enumerate(records) if i not in rejected]
+            self.stats["duplicates"] += len(rejected)
+        self.stats["inserted"] += len(records)
+        # insert_many filled in each record's _id, which keys the lexical index
+        self.lexical_index.add(records)
+        if self.vector_index is not None and records:
+            texts, vectors, metadatas = zip(*iter_export(records))
+            self.vector_index.add_embeddings(list(texts), list(vectors), list(metadatas))
+        return records
+
+    async def ingest_file(self, path: str) -> int:
+        # pypdf parsing and splitting would otherwise hold the event loop for the whole file
+        chunks = await cpu_executor.run(split_file, path)
+        self.stats["chunks"] += len(chunks)
+
+        chunks = await self.new_chunks(chunks)
+        batches = [chunks[i:i + self.batch_size] for i in range(0, len(chunks), self.batch_size)]
+        # A failed batch cancels its siblings, so the file fails fast and is retried as a whole
+        async with asyncio.TaskGroup() as group:
+            for batch in batches:
+                group.create_task(self.insert_batch(batch))
+        if chunks:
+            # Persist before the checkpoint so a completed file is always searchable lexically
+            await db_executor.run(self.lexical_index.save)
+            if self.vector_index is not None:
+                await db_executor.run(self.vector_index.save)
+        return len(chunks)
+
+    async def run(self, paths: Iterable[str]) -> dict:
+        await self.ensure_index()
+        for path in iter_files(paths):
+            if self.checkpoint.is_done(path):
+                self.stats["files_skipped"] += 1
+                continue
+            try:
+                chunks = await self.ingest_file(path)
+            except Exception as e:
+                # Leave the file out of the checkpoint so the next run retries it
+                logging.error(f"Failed to ingest {path}: {e}")
+                self.stats["failed_files"] += 1
+                continue
+            await db_executor.run(self.checkpoint.mark_done, path, chunks)
+            self.stats["files"] += 1
+        return self.stats
+
+
+async def ingest(paths: Iterable[str], **kwargs) -> dict:
+    return await IngestionPipeline(**kwargs).run(paths)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Files or directories to ingest")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=EMBED_MAX_CONCURRENCY)
+    parser.add_argument("--rpm", type=int, default=EMBED_REQUESTS_PER_MINUTE, help="Embedding requests per minute")
+    parser.add_argument("--checkpoint", default=INGEST_CHECKPOINT_FILE)
+    args = parser.parse_args()
+
+    stats = asyncio.run(ingest(
+        args.paths,
+        checkpoint=Checkpoint(args.checkpoint),
+        batch_size=args.batch_size,
+        max_concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+    ))
+    print(json.dumps(stats, indent=2))
+    return 1 if stats["failed_files"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
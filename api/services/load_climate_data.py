@@ -1,25 +1,151 @@
+import os
+import asyncio
+import httpx
 import requests
 import pandas as pd
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+from api.services.climate_store import climate_store, SeriesKey
+from api.services.executors import db_executor
 
-nasa_url = "https://power.larc.nasa.gov/api/projection/daily/point?start=20200101&end=20241105&latitude=27.7103&longitude=85.3222&community=ag&parameters=PRECTOTCORR%2CT2M&format=json&user=utkarsha&header=true&time-standard=utc&model=ensemble&scenario=ssp126"
+NASA_POWER_URL = "https://power.larc.nasa.gov/api/projection/daily/point"
+NASA_POWER_USER = os.getenv("NASA_POWER_USER", "utkarsha")
+NASA_POWER_TIMEOUT = float(os.getenv("NASA_POWER_TIMEOUT", 60))
+NASA_POWER_MAX_CONCURRENCY = int(os.getenv("NASA_POWER_MAX_CONCURRENCY", 4))
 
-def get_climate_data():
-    response = requests.get(nasa_url)
+# Kathmandu, the location the forecasting models were trained on
+DEFAULT_LATITUDE = 27.7103
+DEFAULT_LONGITUDE = 85.3222
+DEFAULT_PARAMETERS = ("PRECTOTCORR", "T2M")
+DEFAULT_SCENARIO = "ssp126"
+DEFAULT_START = datetime(2020, 1, 1)
+# Last day requested from NASA POWER. The models were trained on a window ending 2024-11-05;
+# set to "today" to keep extending the series with the latest projection days.
+NASA_POWER_END_DATE = os.getenv("NASA_POWER_END_DATE", "20241105")
+
+# Column names used by the forecasting models for each NASA POWER parameter
+PARAMETER_COLUMNS = {
+    "PRECTOTCORR": "Precipitation",
+    "T2M": "Temperature",
+}
+
+def build_nasa_url(latitude: float, longitude: float, start: datetime, end: datetime,
+                   parameters: Sequence[str] = DEFAULT_PARAMETERS, scenario: str = DEFAULT_SCENARIO) -> str:
+    return (
+        f"{NASA_POWER_URL}?start={start:%Y%m%d}&end={end:%Y%m%d}"
+        f"&latitude={latitude}&longitude={longitude}&community=ag"
+        f"&parameters={'%2C'.join(parameters)}&format=json&user={NASA_POWER_USER}&header=true"
+        f"&time-standard=utc&model=ensemble&scenario={scenario}"
+    )
+
+def parse_nasa_response(data: dict, parameters: Sequence[str] = DEFAULT_PARAMETERS) -> pd.DataFrame:
+    values = data['properties']['parameter']
+    dates = list(values[parameters[0]].keys())
+
+    climate_df = pd.DataFrame({'Date': dates})
+    for parameter in parameters:
+        climate_df[parameter] = [values[parameter][date] for date in dates]
+
+    climate_df['Date'] = pd.to_datetime(climate_df['Date'])
+    climate_df.set_index('Date', inplace=True)
+    return climate_df
+
+def fetch_climate_series(latitude: float, longitude: float, start: datetime, end: datetime,
+                         parameters: Sequence[str] = DEFAULT_PARAMETERS, scenario: str = DEFAULT_SCENARIO) -> pd.DataFrame:
+    response = requests.get(build_nasa_url(latitude, longitude, start, end, parameters, scenario), timeout=NASA_POWER_TIMEOUT)
     if response.status_code == 200:
-        data = response.json()
-        parameters = data['properties']['parameter']
-        dates = list(parameters['PRECTOTCORR'].keys())
-
-        precipitation = [parameters['PRECTOTCORR'][date] for date in dates]
-        temperature = [parameters['T2M'][date] for date in dates]
-        
-        climate_change_df = pd.DataFrame({
-            'Date': dates,
-            'Precipitation': precipitation,
-            'Temperature': temperature
-        })
-        climate_change_df['Date'] = pd.to_datetime(climate_change_df['Date'])
-        climate_change_df.set_index('Date', inplace=True)
-        return climate_change_df
+        return parse_nasa_response(response.json(), parameters)
     else:
         raise Exception("Failed to retrieve data from NASA API.")
+
+def default_end_date() -> datetime:
+    if NASA_POWER_END_DATE.lower() == "today":
+        return datetime.utcnow()
+    return datetime.strptime(NASA_POWER_END_DATE, "%Y%m%d")
+
+def fetch_window(key: SeriesKey, end: Optional[datetime] = None):
+    """
+    Returns the (start, end) range still missing from the stored series,
+    or None when the store is already up to date.
+    """
+    end = end or default_end_date()
+    last_date = climate_store.last_date(key)
+    start = DEFAULT_START if last_date is None else last_date.to_pydatetime() + timedelta(days=1)
+    if start.date() > end.date():
+        return None
+    return start, end
+
+def to_model_frame(series: pd.DataFrame) -> pd.DataFrame:
+    return series.rename(columns=PARAMETER_COLUMNS).copy()
+
+def get_climate_data(latitude: float = DEFAULT_LATITUDE, longitude: float = DEFAULT_LONGITUDE,
+                     parameters: Sequence[str] = DEFAULT_PARAMETERS, scenario: str = DEFAULT_SCENARIO) -> pd.DataFrame:
+    key = SeriesKey(latitude, longitude, tuple(parameters), scenario)
+
+    # Steady state: the series is in memory and still within its TTL
+    if climate_store.is_fresh(key):
+        return to_model_frame(climate_store.get(key))
+
+    with climate_store.lock_for(key):
+        # Another request may have refreshed the series while we waited
+        if climate_store.is_fresh(key):
+            return to_model_frame(climate_store.get(key))
+
+        # Fetch only the days after the last stored observation
+        window = fetch_window(key)
+        new_rows = None
+        if window:
+            try:
+                new_rows = fetch_climate_series(latitude, longitude, window[0], window[1], parameters, scenario)
+            except Exception:
+                # Serve the stale series rather than failing when NASA is unavailable
+                if climate_store.get(key) is None:
+                    raise
+                return to_model_frame(climate_store.get(key))
+
+        return to_model_frame(climate_store.merge(key, new_rows))
+
+async def aget_climate_data(client: httpx.AsyncClient, latitude: float, longitude: float,
+                            parameters: Sequence[str] = DEFAULT_PARAMETERS, scenario: str = DEFAULT_SCENARIO) -> pd.DataFrame:
+    key = SeriesKey(latitude, longitude, tuple(parameters), scenario)
+    if climate_store.is_fresh(key):
+        return to_model_frame(climate_store.get(key))
+
+    async with climate_store.async_lock_for(key):
+        # The same location may have been refreshed by another request or batch entry while we waited
+        if climate_store.is_fresh(key):
+            return to_model_frame(climate_store.get(key))
+
+        window = fetch_window(key)
+        new_rows = None
+        if window:
+            try:
+                response = await client.get(build_nasa_url(latitude, longitude, window[0], window[1], parameters, scenario))
+                response.raise_for_status()
+                new_rows = parse_nasa_response(response.json(), parameters)
+            except Exception:
+                if climate_store.get(key) is None:
+                    raise Exception(f"Failed to retrieve data from NASA API for ({latitude}, {longitude}).")
+                return to_model_frame(climate_store.get(key))
+
+        # Merging writes the Parquet snapshot, so keep it off the event loop
+        return to_model_frame(await db_executor.run(climate_store.merge, key, new_rows))
+
+async def get_climate_data_many(locations: List[Tuple[float, float]], max_concurrency: int = NASA_POWER_MAX_CONCURRENCY) -> list:
+    """
+    Fetch the series of several locations concurrently through a bounded
+    connection pool. Failed locations are returned as exceptions.
+    """
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=NASA_POWER_TIMEOUT) as client:
+        async def fetch(latitude, longitude):
+            async with semaphore:
+                frame = await aget_climate_data(client, latitude, longitude)
+            # An empty series has no last day to forecast from; report it for this location only
+            if frame.empty:
+                raise ValueError(f"No climate data available for ({latitude}, {longitude}).")
+            return frame
+
+        return await asyncio.gather(*[fetch(latitude, longitude) for latitude, longitude in locations], return_exceptions=True)
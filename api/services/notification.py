@@ -9,7 +9,7 @@ from typing import List, Optional
 users_collection = get_collections().get('users')
 notifications_collection = get_collections().get('notifications')
 
-def find_tagged_users(content: str):
+async def find_tagged_users(content: str):
     """
     Finds all tagged users in the content (e.g., @username).
     """
@@ -18,10 +18,10 @@ def find_tagged_users(content: str):
         return []
 
     # Fetch all users that are tagged in one query
-    users = list(users_collection.find({"username": {"$in": mentions}}))
+    users = await users_collection.find({"username": {"$in": mentions}}).to_list(length=None)
     return {user['username']: user for user in users}  # Return a dictionary for quick lookups
 
-def create_notifications(post_id: Optional[str], content: str, author_username: str, 
+async def create_notifications(post_id: Optional[str], content: str, author_username: str, 
                          comment_id: Optional[str] = None, project_id: Optional[str] = None, 
                          team_members_usernames: List[str] = None):
     """
@@ -34,7 +34,7 @@ def create_notifications(post_id: Optional[str], content: str, author_username:
 
     # Case 1: Create tag notifications (for tagged users in a post/comment)
     if content:
-        tagged_users_map = find_tagged_users(content)
+        tagged_users_map = await find_tagged_users(content)
 
         if not isinstance(tagged_users_map, dict):
             tagged_users_map = {}
@@ -58,14 +58,14 @@ def create_notifications(post_id: Optional[str], content: str, author_username:
     if project_id and team_members_usernames:
         # Fetch the current project team members (existing members)
         existing_team_members = set(
-            [user['username'] for user in users_collection.find({"projectsInvolved.projectId": ObjectId(project_id)})]
+            [user['username'] async for user in users_collection.find({"projectsInvolved.projectId": ObjectId(project_id)})]
         )
 
         # Filter the newly added team members
         newly_added_members = [username for username in team_members_usernames if username not in existing_team_members]
 
         if newly_added_members:
-            users = list(users_collection.find({"username": {"$in": newly_added_members}}))
+            users = await users_collection.find({"username": {"$in": newly_added_members}}).to_list(length=None)
 
             for user in users:
                 if user['username'] != author_username:  # Don't notify the author
@@ -83,4 +83,4 @@ def create_notifications(post_id: Optional[str], content: str, author_username:
 
     if notifications:
         # Insert all notifications in a batch
-        notifications_collection.insert_many(notifications)
\ No newline at end of file
+        await notifications_collection.insert_many(notifications)
\ No newline at end of file
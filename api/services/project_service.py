@@ -19,7 +19,7 @@ async def update_project(project_id: str, project_data: ProjectCreateRequest, cu
             raise HTTPException(status_code=400, detail="Invalid project ID format")
         
         # Fetch the project from the database
-        project = projects_collections.find_one({"_id": project_object_id})
+        project = await projects_collections.find_one({"_id": project_object_id})
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
 
@@ -55,7 +55,7 @@ async def update_project(project_id: str, project_data: ProjectCreateRequest, cu
             usernames = project_data.teamMembers
             # Fetch users by username and convert cursor to a list
             users_cursor = users_collections.find({"username": {"$in": usernames}})
-            users = list(users_cursor)
+            users = await users_cursor.to_list(length=None)
 
             # Build the team members list with userId and username
             team_member_usernames = []
@@ -85,7 +85,7 @@ async def update_project(project_id: str, project_data: ProjectCreateRequest, cu
             if newly_added_usernames:
                 # Log the newly added users for debugging purposes
                 print(f"Newly added team members: {newly_added_usernames}")
-                create_notifications(
+                await create_notifications(
                     post_id=None,  # No post related to project creation
                     content=None,  # No content related to the project creation
                     author_username=current_user.username,
@@ -94,7 +94,7 @@ async def update_project(project_id: str, project_data: ProjectCreateRequest, cu
                 )
 
         # Update the project in the database
-        updated_project = projects_collections.find_one_and_update(
+        updated_project = await projects_collections.find_one_and_update(
             {"_id": project_object_id},
             {"$set": update_data},
             return_document=True
@@ -110,7 +110,7 @@ async def update_project(project_id: str, project_data: ProjectCreateRequest, cu
                 project_info = {"projectId": str(project_id), "projectName": project_data.projectName}
 
                 # Update the user's projectsInvolved field
-                users_collections.update_one(
+                await users_collections.update_one(
                     {"_id": user_id, "projectsInvolved.projectId": str(project_id)},  
                     {"$set": {
                         "projectsInvolved.$": project_info  
@@ -118,7 +118,7 @@ async def update_project(project_id: str, project_data: ProjectCreateRequest, cu
                 )
 
                 # If the user doesn't already have the project, add it
-                users_collections.update_one(
+                await users_collections.update_one(
                     {"_id": user_id, "projectsInvolved.projectId": {"$ne": str(project_id)}},  
                     {"$addToSet": {"projectsInvolved": project_info}}  
                 )
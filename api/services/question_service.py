@@ -1,58 +1,68 @@
+import time
+from typing import AsyncIterator
 from pydantic import BaseModel
 from fastapi import HTTPException
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from api.models.retriever import get_vector_retriever
-from langchain_google_genai import ChatGoogleGenerativeAI, ChatGoogleGenerativeAI
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
-from langchain.prompts import PromptTemplate
-from api.models.get_database_collection import get_collections
-import os
-from dotenv import load_dotenv
-
-
-load_dotenv()
-
-
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-embeddings_collection = get_collections().get('embeddings')
+from api.services.chain_registry import chain_registry
+from api.services.semantic_cache import semantic_cache
+from api.services.executors import llm_executor
 
 
 # Request model
 class QuestionRequest(BaseModel):
     user_input: str
 
+def document_ids(docs) -> list:
+    return [str(doc.metadata.get("_id")) for doc in docs]
+
+def document_sources(docs) -> list:
+    return [
+        {"id": str(doc.metadata.get("_id")), "source": doc.metadata.get("source"), "page": doc.metadata.get("page")}
+        for doc in docs
+    ]
+
 # Function to answer question
 def process_question(user_input: str):
     if not user_input:
         raise HTTPException(status_code=400, detail="User input is required")
-        
-    model = ChatGoogleGenerativeAI(model="gemini-1.5-pro", temperature=0.2, api_key=GOOGLE_API_KEY)
-    template = """
-    Task: Answer the question using only the provided context: {context}.
-    Context: The documents consist of reports, policies, and publications related to Climate Change and Gender Inequality.
-    Instructions:
-        Provide accurate, detailed answers strictly based on the given documents.
-        Cite relevant references on the relationship between gender and climate change.
-        Do not introduce information beyond the documents or make assumptions.
-        If the query is unclear or lacks sufficient detail, ask for clarification before responding.
-        Maintain a neutral tone in your answer.
-        Avoid starting with phrases like "The provided text..."
-    Question: {question}
-    """
-    prompt_template = PromptTemplate(
-        input_variables=["context", "question"],
-        template=template
-    )
-    retriever = get_vector_retriever(embeddings_collection)
-    rag_chain = (
-        {
-            "context": retriever,
-            "question": RunnablePassthrough()
-        }
-        | prompt_template
-        | model
-        | StrOutputParser()
-    )
-    answer = rag_chain.invoke(user_input)
+
+    started_at = time.perf_counter()
+
+    # Embed once: the vector serves both the semantic cache and the retrieval
+    embedding = chain_registry.embeddings.embed_query(user_input)
+    cached = semantic_cache.lookup(embedding)
+    if cached:
+        return cached.answer
+
+    docs = chain_registry.retrieve(user_input, embedding)
+    answer = chain_registry.answer_chain.invoke({"context": docs, "question": user_input})
+
+    semantic_cache.store(user_input, embedding, document_ids(docs), answer, time.perf_counter() - started_at)
     return answer
+
+async def stream_question(user_input: str) -> AsyncIterator[dict]:
+    """
+    Answer a question as a sequence of events: the retrieved sources first,
+    then the answer tokens as Gemini generates them.
+    """
+    if not user_input:
+        raise HTTPException(status_code=400, detail="User input is required")
+
+    started_at = time.perf_counter()
+    embedding = await chain_registry.embeddings.aembed_query(user_input)
+
+    cached = semantic_cache.lookup(embedding)
+    if cached:
+        yield {"event": "sources", "data": {"sources": [{"id": doc_id} for doc_id in cached.doc_ids], "cached": True}}
+        yield {"event": "token", "data": {"text": cached.answer}}
+        return
+
+    docs = await llm_executor.run(chain_registry.retrieve, user_input, embedding)
+    yield {"event": "sources", "data": {"sources": document_sources(docs), "cached": False}}
+
+    chunks = []
+    async for chunk in chain_registry.answer_chain.astream({"context": docs, "question": user_input}):
+        chunks.append(chunk)
+        yield {"event": "token", "data": {"text": chunk}}
+
+    # Only complete answers are cached; a cancelled stream never gets here
+    semantic_cache.store(user_input, embedding, document_ids(docs), "".join(chunks), time.perf_counter() - started_at)
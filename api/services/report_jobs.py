@@ -0,0 +1,171 @@
+# api/services/report_jobs.py
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from pymongo.errors import PyMongoError
+from api.models.get_database_collection import get_collections
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", 2))
+REPORT_JOB_MAX_QUEUED = int(os.getenv("REPORT_JOB_MAX_QUEUED", 100))
+REPORT_JOB_TTL_SECONDS = int(os.getenv("REPORT_JOB_TTL_SECONDS", 7 * 24 * 60 * 60))
+REPORT_JOB_HEARTBEAT_SECONDS = int(os.getenv("REPORT_JOB_HEARTBEAT_SECONDS", 30))
+# Unfinished jobs whose process has sent no heartbeat for this long are failed
+REPORT_JOB_STALE_SECONDS = int(os.getenv("REPORT_JOB_STALE_SECONDS", 120))
+
+FINISHED_STATUSES = ("completed", "failed")
+UNFINISHED_STATUSES = ("queued", "running")
+
+
+class ReportJobQueue:
+    """
+    Runs report jobs on a fixed number of background workers. Job status and
+    per-node progress are kept in the `report_jobs` collection, so any
+    worker process can answer status requests.
+
+    The queue itself lives in this process. Each process stamps a heartbeat
+    on its unfinished jobs, and jobs whose heartbeat goes stale (their
+    process restarted or died) are marked failed and handed to
+    `on_abandoned`, so their sessions can be released.
+    """
+
+    def __init__(self, workers: int = REPORT_JOB_WORKERS, max_queued: int = REPORT_JOB_MAX_QUEUED, collection=None):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._collection = collection
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._on_abandoned: Optional[Callable[[dict], Awaitable[None]]] = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = get_collections().get("report_jobs")
+        return self._collection
+
+    async def start(self, on_abandoned: Optional[Callable[[dict], Awaitable[None]]] = None):
+        self._on_abandoned = on_abandoned
+        await self.collection.create_index("created_at", expireAfterSeconds=REPORT_JOB_TTL_SECONDS)
+        await self.collection.create_index([("status", 1), ("heartbeat_at", 1)])
+        # Fail what a previous process left unfinished before taking new jobs
+        await self.recover_abandoned()
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def submit(self, run: Callable[[str], Awaitable[dict]], **fields) -> str:
+        """
+        Queue `run(job_id)`, whose result dict is stored on the job when it completes.
+        Raises asyncio.QueueFull when the queue is at capacity.
+        """
+        job_id = str(uuid.uuid4())
+        if self._queue.full():
+            raise asyncio.QueueFull()
+        now = datetime.utcnow()
+        await self.collection.insert_one({
+            "_id": job_id,
+            "status": "queued",
+            "events": [],
+            "worker_id": self.worker_id,
+            "heartbeat_at": now,
+            "created_at": now,
+            "updated_at": now,
+            **fields,
+        })
+        self._queue.put_nowait((job_id, run))
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": job_id})
+
+    async def record_event(self, job_id: str, event: dict):
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$push": {"events": {**event, "at": time.time()}}, "$set": {"updated_at": datetime.utcnow()}},
+        )
+
+    async def _set(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        await self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+    async def _abandon(self, job: dict, error: str) -> bool:
+        # Conditional on the status, so only one process fails (and releases) each job
+        result = await self.collection.update_one(
+            {"_id": job["_id"], "status": {"$in": UNFINISHED_STATUSES}},
+            {"$set": {"status": "failed", "error": error, "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+        )
+        if result.modified_count and self._on_abandoned:
+            await self._on_abandoned(job)
+        return bool(result.modified_count)
+
+    async def recover_abandoned(self) -> int:
+        """
+        Fail unfinished jobs of processes that stopped sending heartbeats.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=REPORT_JOB_STALE_SECONDS)
+        jobs = await self.collection.find({
+            "status": {"$in": UNFINISHED_STATUSES},
+            "worker_id": {"$ne": self.worker_id},
+            "heartbeat_at": {"$not": {"$gte": cutoff}},
+        }).to_list(length=None)
+        recovered = 0
+        for job in jobs:
+            if await self._abandon(job, "The worker running this job stopped"):
+                recovered += 1
+        if recovered:
+            logging.info(f"Failed {recovered} report jobs abandoned by stopped workers")
+        return recovered
+
+    async def _heartbeat(self, interval: int = REPORT_JOB_HEARTBEAT_SECONDS):
+        while True:
+            try:
+                await self.collection.update_many(
+                    {"worker_id": self.worker_id, "status": {"$in": UNFINISHED_STATUSES}},
+                    {"$set": {"heartbeat_at": datetime.utcnow()}},
+                )
+                await self.recover_abandoned()
+            except PyMongoError as e:
+                logging.error(f"Error updating report job heartbeats: {e}")
+            await asyncio.sleep(interval)
+
+    async def _worker(self):
+        while True:
+            job_id, run = await self._queue.get()
+            try:
+                await self._set(job_id, status="running", started_at=datetime.utcnow())
+                result = await run(job_id)
+                await self._set(job_id, status="completed", finished_at=datetime.utcnow(), **result)
+            except asyncio.CancelledError:
+                job = await self.get(job_id)
+                if job:
+                    await self._abandon(job, "Worker shut down")
+                raise
+            except Exception as e:
+                logging.error(f"Report job {job_id} failed: {e}")
+                await self._set(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queued": self.max_queued,
+        }
+
+
+# Shared queue for the process
+report_jobs = ReportJobQueue()
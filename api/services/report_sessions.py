@@ -0,0 +1,97 @@
+# api/services/report_sessions.py
+import os
+import asyncio
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo.errors import PyMongoError
+from api.models.get_database_collection import get_collections
+from api.services.checkpointer import delete_thread
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# A report thread waiting for feedback is abandoned after this long
+REPORT_SESSION_TTL_SECONDS = int(os.getenv("REPORT_SESSION_TTL_SECONDS", 24 * 60 * 60))
+REPORT_SESSION_SWEEP_SECONDS = int(os.getenv("REPORT_SESSION_SWEEP_SECONDS", 15 * 60))
+# Mongo's TTL monitor removes session documents the sweeper has missed after this grace period
+REPORT_SESSION_GRACE_SECONDS = int(os.getenv("REPORT_SESSION_GRACE_SECONDS", 60 * 60))
+
+
+class ReportSessionStore:
+    """
+    Report sessions (topic, analysts, owner) in the `report_sessions`
+    collection, keyed by LangGraph thread id. The graph state itself lives
+    in the checkpointer, so any worker can resume a session.
+    """
+
+    def __init__(self, collection=None):
+        self._collection = collection
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = get_collections().get("report_sessions")
+        return self._collection
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=REPORT_SESSION_GRACE_SECONDS)
+
+    async def create(self, thread_id: str, topic: str, max_analysts: int, analysts: list, username: str):
+        now = datetime.utcnow()
+        await self.collection.insert_one({
+            "_id": thread_id,
+            "topic": topic,
+            "max_analysts": max_analysts,
+            "analysts": analysts,
+            "username": username,
+            "status": "awaiting_feedback",
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=REPORT_SESSION_TTL_SECONDS),
+        })
+
+    async def get(self, thread_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": thread_id, "expires_at": {"$gt": datetime.utcnow()}})
+
+    async def update(self, thread_id: str, **fields):
+        # Any activity keeps the session alive
+        fields["expires_at"] = datetime.utcnow() + timedelta(seconds=REPORT_SESSION_TTL_SECONDS)
+        await self.collection.update_one({"_id": thread_id}, {"$set": fields})
+
+    async def claim(self, thread_id: str, username: str, status: str = "running") -> Optional[dict]:
+        """
+        Atomically move one of the user's sessions out of `awaiting_feedback`,
+        so only its owner can resume it and only one worker runs it to completion.
+        """
+        return await self.collection.find_one_and_update(
+            {"_id": thread_id, "username": username, "status": "awaiting_feedback", "expires_at": {"$gt": datetime.utcnow()}},
+            {"$set": {"status": status, "expires_at": datetime.utcnow() + timedelta(seconds=REPORT_SESSION_TTL_SECONDS)}},
+        )
+
+    async def delete(self, thread_id: str):
+        await delete_thread(thread_id)
+        await self.collection.delete_one({"_id": thread_id})
+
+    async def evict_expired(self) -> int:
+        """
+        Delete expired sessions together with their checkpoints.
+        """
+        expired = await self.collection.find({"expires_at": {"$lte": datetime.utcnow()}}, {"_id": 1}).to_list(length=None)
+        for session in expired:
+            await self.delete(session["_id"])
+        return len(expired)
+
+
+# Shared store for the process
+report_sessions = ReportSessionStore()
+
+async def run_session_sweeper(interval: int = REPORT_SESSION_SWEEP_SECONDS, store: ReportSessionStore = report_sessions):
+    while True:
+        try:
+            evicted = await store.evict_expired()
+            if evicted:
+                logging.info(f"Evicted {evicted} abandoned report sessions")
+        except (PyMongoError, sqlite3.Error, OSError) as e:
+            logging.error(f"Error evicting report sessions: {e}")
+        await asyncio.sleep(interval)
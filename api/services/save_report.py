@@ -1,6 +1,6 @@
-def save_report(collection, report_data):
+async def save_report(collection, report_data):
     try:
-        collection.insert_one(report_data)
+        await collection.insert_one(report_data)
         print("Report saved successfully!")
     except Exception as e:
         print(f"Error saving report: {e}")
\ No newline at end of file
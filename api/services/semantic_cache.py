@@ -0,0 +1,205 @@
+# api/services/semantic_cache.py
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, NamedTuple, Set
+import numpy as np
+from pymongo.errors import PyMongoError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 2048))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", 24 * 60 * 60))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+CORPUS_POLL_SECONDS = int(os.getenv("CORPUS_POLL_SECONDS", 60))
+
+
+class CachedAnswer(NamedTuple):
+    question: str
+    embedding: np.ndarray
+    doc_ids: List[str]
+    answer: str
+    latency: float
+    expires_at: float
+
+
+class SemanticCache:
+    """
+    Answers keyed by question embedding. A new question is served from the
+    cache when its cosine similarity to a cached question reaches the
+    threshold. Entries are evicted by TTL and LRU order, and dropped when a
+    document they were answered from changes.
+    """
+
+    def __init__(self, maxsize: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL_SECONDS,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        # Normalized embeddings in a preallocated matrix: a new entry writes one
+        # row, and rows freed by eviction are reused
+        self._matrix: Optional[np.ndarray] = None
+        self._valid = np.zeros(maxsize, dtype=bool)
+        self._row_ids: List[Optional[int]] = [None] * maxsize
+        self._rows: Dict[int, int] = {}
+        self._free_rows: List[int] = []
+        self._used_rows = 0
+
+        # Entry ids by the document ids their answer was generated from
+        self._by_document: Dict[str, Set[int]] = {}
+
+        # Metrics
+        self.lookups = 0
+        self.hits = 0
+        self.latency_saved_seconds = 0.0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _add(self, entry: CachedAnswer):
+        entry_id = self._next_id
+        self._next_id += 1
+
+        if self._matrix is None:
+            self._matrix = np.zeros((self.maxsize, len(entry.embedding)), dtype=np.float32)
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = self._used_rows
+            self._used_rows += 1
+
+        self._matrix[row] = entry.embedding
+        self._valid[row] = True
+        self._row_ids[row] = entry_id
+        self._rows[entry_id] = row
+        self._entries[entry_id] = entry
+        for doc_id in entry.doc_ids:
+            self._by_document.setdefault(doc_id, set()).add(entry_id)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        row = self._rows.pop(entry_id)
+        self._valid[row] = False
+        self._row_ids[row] = None
+        self._free_rows.append(row)
+        for doc_id in entry.doc_ids:
+            ids = self._by_document.get(doc_id)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._by_document[doc_id]
+
+    def _evict_expired(self, now: float):
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry.expires_at < now]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def lookup(self, embedding) -> Optional[CachedAnswer]:
+        query = self._normalize(embedding)
+        with self._lock:
+            self.lookups += 1
+            self._evict_expired(time.monotonic())
+            if not self._entries:
+                return None
+
+            # Score only the rows ever written; freed rows are masked out
+            similarities = self._matrix[:self._used_rows] @ query
+            similarities[~self._valid[:self._used_rows]] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            entry_id = self._row_ids[best]
+            self._entries.move_to_end(entry_id)
+            entry = self._entries[entry_id]
+            self.hits += 1
+            self.latency_saved_seconds += entry.latency
+            return entry
+
+    def store(self, question: str, embedding, doc_ids: List[str], answer: str, latency: float):
+        with self._lock:
+            while len(self._entries) >= self.maxsize:
+                self._remove(next(iter(self._entries)))
+            self._add(CachedAnswer(
+                question=question,
+                embedding=self._normalize(embedding),
+                doc_ids=doc_ids,
+                answer=answer,
+                latency=latency,
+                expires_at=time.monotonic() + self.ttl,
+            ))
+
+    def invalidate_documents(self, doc_ids: Iterable[str]) -> int:
+        """
+        Drop the answers generated from any of these documents.
+        """
+        with self._lock:
+            entry_ids = set()
+            for doc_id in doc_ids:
+                entry_ids |= self._by_document.get(str(doc_id), set())
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+            if entry_ids:
+                self.invalidations += 1
+            return len(entry_ids)
+
+    def clear(self):
+        with self._lock:
+            for entry_id in list(self._entries):
+                self._remove(entry_id)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_ratio": self.hits / self.lookups if self.lookups else 0.0,
+            "latency_saved_seconds": self.latency_saved_seconds,
+            "invalidations": self.invalidations,
+            "threshold": self.threshold,
+        }
+
+
+# Shared cache for the process
+semantic_cache = SemanticCache()
+
+async def watch_corpus_changes(collection, cache: SemanticCache = semantic_cache):
+    """
+    Drop cached answers when the embeddings collection changes. With a change
+    stream, an updated or deleted chunk drops only the answers generated from
+    it, while an insert (which may outrank any cached sources) drops them all.
+    Without one, the document count is polled.
+    """
+    try:
+        async with collection.watch() as stream:
+            async for change in stream:
+                if change.get("operationType") in ("update", "replace", "delete"):
+                    cache.invalidate_documents([str(change["documentKey"]["_id"])])
+                else:
+                    cache.clear()
+    except PyMongoError as e:
+        logging.error(f"Change streams unavailable for the embeddings collection, polling instead: {e}")
+
+    last_count = None
+    while True:
+        try:
+            count = await collection.estimated_document_count()
+            if last_count is not None and count != last_count:
+                cache.clear()
+            last_count = count
+        except PyMongoError as e:
+            logging.error(f"Error polling the embeddings collection: {e}")
+        await asyncio.sleep(CORPUS_POLL_SECONDS)
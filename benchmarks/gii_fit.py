@@ -0,0 +1,47 @@
+# benchmarks/gii_fit.py
+"""
+Compare serial and process-pool Prophet fitting throughput for GII forecasts.
+
+Usage: python -m benchmarks.gii_fit --countries 24 --workers 4
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from api.services.executors import CPU_COUNT
+from api.services.gii import fetch_gii_data, fit_country_model, split_countries
+
+def run_serial(series):
+    start = time.perf_counter()
+    for country_data_prophet in series.values():
+        fit_country_model(country_data_prophet)
+    return time.perf_counter() - start
+
+def run_pooled(series, workers):
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fit_country_model, series.values()))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--countries", type=int, default=24, help="Number of countries to fit")
+    parser.add_argument("--workers", type=int, default=CPU_COUNT, help="Process pool size")
+    args = parser.parse_args()
+
+    # Countries with too few observations cannot be fitted
+    series = {
+        country: frame for country, frame in split_countries(fetch_gii_data()).items()
+        if frame["y"].notna().sum() >= 2
+    }
+    series = dict(list(series.items())[:args.countries])
+
+    serial_seconds = run_serial(series)
+    pooled_seconds = run_pooled(series, args.workers)
+
+    print(f"countries: {len(series)}  workers: {args.workers}")
+    print(f"serial: {serial_seconds:.2f}s  ({len(series) / serial_seconds:.2f} fits/s)")
+    print(f"pooled: {pooled_seconds:.2f}s  ({len(series) / pooled_seconds:.2f} fits/s)")
+    print(f"speedup: {serial_seconds / pooled_seconds:.2f}x")
+
+if __name__ == "__main__":
+    main()
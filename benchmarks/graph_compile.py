@@ -0,0 +1,43 @@
+# benchmarks/graph_compile.py
+"""
+Measure what compiling the research graph (with its interview subgraph)
+costs each request, against reusing the graph compiled by the registry.
+
+Usage: python -m benchmarks.graph_compile --iterations 50
+"""
+import argparse
+import time
+from langgraph.checkpoint.memory import MemorySaver
+from agents.research import research_graph_builder
+from api.services.graph_registry import GraphRegistry
+
+def run_per_request(iterations: int, checkpointer):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        research_graph_builder(checkpointer)
+    return time.perf_counter() - start
+
+def run_registry(iterations: int, checkpointer):
+    registry = GraphRegistry()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        # Only the first call compiles
+        registry._get("research", lambda: research_graph_builder(checkpointer))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50, help="Simulated report requests")
+    args = parser.parse_args()
+
+    # The checkpointer only matters at run time, so an in-memory one isolates compile cost
+    checkpointer = MemorySaver()
+    per_request_seconds = run_per_request(args.iterations, checkpointer)
+    registry_seconds = run_registry(args.iterations, checkpointer)
+
+    print(f"Compile per request: {per_request_seconds:.3f}s ({per_request_seconds / args.iterations * 1000:.1f} ms/request)")
+    print(f"Registry (compile once): {registry_seconds:.3f}s ({registry_seconds / args.iterations * 1000:.1f} ms/request)")
+    print(f"Removed per request: {(per_request_seconds - registry_seconds) / args.iterations * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/login.py
+"""
+Measure logins per second under concurrent load.
+
+By default the password verification step of a login is benchmarked
+in-process, inline on the event loop versus on the auth executor. With
+--url, concurrent requests are sent to a running /token endpoint instead.
+
+Usage:
+    python -m benchmarks.login --logins 200 --concurrency 50
+    python -m benchmarks.login --url http://localhost:8000/auth/token --username demo --password secret
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from api.models.auth import pwd_context, verify_and_update_password
+from api.services.executors import auth_executor, ExecutorSaturated
+
+async def run_concurrently(login, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {"ok": 0, "rejected": 0, "failed": 0}
+
+    async def one():
+        async with semaphore:
+            try:
+                results["ok" if await login() else "failed"] += 1
+            except ExecutorSaturated:
+                results["rejected"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(logins)])
+    return time.perf_counter() - start, results
+
+def report(label: str, seconds: float, results: dict):
+    print(f"{label}: {results['ok'] / seconds:.1f} logins/s  ({seconds:.2f}s, {results})")
+
+async def bench_in_process(logins: int, concurrency: int):
+    password = "benchmark-password"
+    hashed_password = pwd_context.hash(password)
+    print(f"bcrypt rounds: {pwd_context.to_dict()['bcrypt__rounds']}  auth workers: {auth_executor.max_workers}")
+
+    async def inline():
+        return verify_and_update_password(password, hashed_password)[0]
+
+    async def pooled():
+        return (await auth_executor.run(verify_and_update_password, password, hashed_password))[0]
+
+    report("inline  ", *await run_concurrently(inline, logins, concurrency))
+    report("executor", *await run_concurrently(pooled, logins, concurrency))
+
+async def bench_endpoint(url: str, username: str, password: str, logins: int, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def login():
+            response = await client.post(url, data={"username": username, "password": password})
+            if response.status_code == 503:
+                raise ExecutorSaturated()
+            return response.status_code == 200
+
+        report("endpoint", *await run_concurrently(login, logins, concurrency))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--url", help="Benchmark a running /token endpoint")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(bench_endpoint(args.url, args.username, args.password, args.logins, args.concurrency))
+    else:
+        asyncio.run(bench_in_process(args.logins, args.concurrency))
+
+if __name__ == "__main__":
+    main()
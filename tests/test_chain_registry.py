@@ -0,0 +1,63 @@
+import threading
+from langchain_core.runnables import RunnableLambda
+from api.services import chain_registry as registry_module
+from api.services.chain_registry import ChainRegistry
+
+
+class StubVectorStore:
+    def as_retriever(self, **kwargs):
+        return RunnableLambda(lambda query: [])
+
+
+class StubLexicalIndex:
+    @classmethod
+    def load(cls, path):
+        return cls()
+
+
+def stub_builders(monkeypatch):
+    builds = []
+
+    def record(name, value):
+        def build(*args, **kwargs):
+            builds.append(name)
+            return value
+        return build
+
+    monkeypatch.setattr(registry_module, "ChatGoogleGenerativeAI", record("llm", RunnableLambda(lambda prompt: "answer")))
+    monkeypatch.setattr(registry_module, "get_embedding_model", record("embedding_model", object()))
+    monkeypatch.setattr(registry_module, "cached_embeddings", lambda model, name: model)
+    monkeypatch.setattr(registry_module, "get_sync_collections", lambda: {})
+    monkeypatch.setattr(registry_module, "get_vector_store", record("vector_store", StubVectorStore()))
+    monkeypatch.setattr(registry_module, "BM25Index", StubLexicalIndex)
+    monkeypatch.setattr(registry_module, "HybridRetriever", record("hybrid_retriever", RunnableLambda(lambda query: [])))
+    return builds
+
+
+def test_warm_builds_nested_components_without_deadlock(monkeypatch):
+    builds = stub_builders(monkeypatch)
+    registry = ChainRegistry()
+
+    # Builders read other lazy components; a non-reentrant registry lock would hang here
+    warm = threading.Thread(target=registry.warm, daemon=True)
+    warm.start()
+    warm.join(timeout=5)
+
+    assert not warm.is_alive()
+    assert registry.rag_chain.invoke("question") == "answer"
+    # Every component is built once, however many others depend on it
+    assert len(builds) == len(set(builds))
+
+
+def test_concurrent_first_access_builds_once(monkeypatch):
+    builds = stub_builders(monkeypatch)
+    registry = ChainRegistry()
+
+    threads = [threading.Thread(target=lambda: registry.answer_chain, daemon=True) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert builds.count("llm") == 1
@@ -0,0 +1,48 @@
+import threading
+from api.models import lexical_index
+from api.models.lexical_index import BM25Index
+
+
+def record(i):
+    return {"_id": f"doc-{i}", "text": f"flood report {i} Karnali"}
+
+
+def test_interleaved_saves_keep_both_processes_additions(tmp_path):
+    path = str(tmp_path / "lexical_index.pkl")
+    first = BM25Index.load(path)
+    second = BM25Index.load(path)
+
+    first.add([record(0)])
+    first.save()
+    # The second instance has not seen the first's snapshot when it appends
+    second.add([record(1)])
+    second.save()
+    first.add([record(2)])
+    first.save()
+
+    assert len(BM25Index.load(path)) == 3
+    first.refresh(force=True)
+    second.refresh(force=True)
+    assert len(first) == len(second) == 3
+
+
+def test_concurrent_saves_with_compaction_lose_nothing(tmp_path, monkeypatch):
+    # Fold the log into a snapshot every few batches, so appends and compactions interleave
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_LOG_MIN_ENTRIES", 2)
+    path = str(tmp_path / "lexical_index.pkl")
+    # Each instance has its own in-process lock, so only the file lock keeps them apart
+    instances = [BM25Index.load(path) for _ in range(2)]
+
+    def ingest(index, start):
+        for i in range(start, start + 40):
+            index.add([record(i)])
+            index.save()
+
+    threads = [threading.Thread(target=ingest, args=(index, n * 1000)) for n, index in enumerate(instances)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(BM25Index.load(path)) == 80